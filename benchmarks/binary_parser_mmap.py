@@ -0,0 +1,56 @@
+"""
+Microbenchmark for BinaryParser.parse_section with and without the memory-mapped mode.
+
+A temporary file of fixed-size records is parsed at random offsets. The default mode reopens,
+seeks and reads the file on every call; use_mmap=True maps it once and unpacks straight from a
+memoryview with a cached struct.Struct.
+
+Usage:
+    python -m benchmarks.binary_parser_mmap [--megabytes N] [--calls N]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from brent.binary_execution.parser import BinaryParser
+
+RECORD_FORMAT = '<IdQ'
+RECORD_SIZE = 20
+
+def run(parser, offsets):
+    """
+    Parse one record at each offset.
+
+    :return: Elapsed seconds.
+    """
+    start_time = time.perf_counter()
+    for offset in offsets:
+        parser.parse_section(offset, RECORD_SIZE, RECORD_FORMAT)
+    return time.perf_counter() - start_time
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare read-per-call and mmap BinaryParser section parsing.")
+    parser.add_argument('--megabytes', type=int, default=256, help="Size of the generated file.")
+    parser.add_argument('--calls', type=int, default=200000, help="parse_section() calls per mode.")
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile(delete=False) as binary_file:
+        chunk = os.urandom(1024 * 1024)
+        for _ in range(args.megabytes):
+            binary_file.write(chunk)
+        path = binary_file.name
+    try:
+        records = args.megabytes * 1024 * 1024 // RECORD_SIZE
+        offsets = [random.randrange(records) * RECORD_SIZE for _ in range(args.calls)]
+        elapsed = run(BinaryParser(path), offsets)
+        print(f"{'read per call':<16} {args.calls / elapsed:>12.1f} calls/s")
+        with BinaryParser(path, use_mmap=True) as mapped:
+            elapsed = run(mapped, offsets)
+        print(f"{'mmap':<16} {args.calls / elapsed:>12.1f} calls/s")
+    finally:
+        os.unlink(path)
+
+if __name__ == "__main__":
+    main()
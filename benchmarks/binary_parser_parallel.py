@@ -0,0 +1,57 @@
+"""
+Scaling benchmark for BinaryParser.parse_parallel.
+
+A temporary file of fixed-size records is reduced to the sum of one field with 1, 2, 4, ... up
+to N worker processes, each parsing its byte ranges from its own memory map. The single-process
+iter_records() pass over a memory map is the baseline. Reports MB/s and the speedup over the baseline.
+
+Usage:
+    python -m benchmarks.binary_parser_parallel [--megabytes N] [--max-processes N] [--chunk-megabytes N]
+"""
+import argparse
+import operator
+import os
+import tempfile
+import time
+
+from brent.binary_execution.parser import BinaryParser, RecordSchema
+
+SCHEMA = RecordSchema([('id', 'I'), ('timestamp', 'q'), ('value', 'd'), ('flags', 'H'), (None, '2x'), ('tag', '8s')])
+
+def sum_values(records):
+    return sum(record[2] for record in records)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure parse_parallel scaling over worker processes.")
+    parser.add_argument('--megabytes', type=int, default=512, help="Size of the generated file.")
+    parser.add_argument('--max-processes', type=int, default=os.cpu_count(), help="Largest pool to try.")
+    parser.add_argument('--chunk-megabytes', type=int, default=16, help="Bytes per range, in MB.")
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile(delete=False) as binary_file:
+        block = SCHEMA.struct.pack(1, 2, 0.5, 4, b"tag") * (1024 * 1024 // SCHEMA.size)
+        for _ in range(args.megabytes):
+            binary_file.write(block)
+        path = binary_file.name
+    try:
+        binary_parser = BinaryParser(path)
+        megabytes = os.path.getsize(path) / 1e6
+        with BinaryParser(path, use_mmap=True) as mapped:
+            start_time = time.perf_counter()
+            sum_values(mapped.iter_records(SCHEMA))
+            baseline = time.perf_counter() - start_time
+        print(f"{'iter_records':<16} {megabytes / baseline:>10.1f} MB/s")
+        processes = 1
+        while processes <= args.max_processes:
+            start_time = time.perf_counter()
+            binary_parser.parse_parallel(SCHEMA, sum_values, operator.add, processes=processes,
+                                         chunk_size=args.chunk_megabytes * 1024 * 1024)
+            elapsed = time.perf_counter() - start_time
+            label = f"{processes} process" + ("es" if processes > 1 else "")
+            print(f"{label:<16} {megabytes / elapsed:>10.1f} MB/s  {baseline / elapsed:>5.2f}x")
+            processes *= 2
+    finally:
+        os.unlink(path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Parse-rate benchmark for fixed-size records in BinaryParser.
+
+A temporary file of records is parsed three ways: one parse_section() call per record, streaming
+with iter_records(), and one NumPy structured array from read_array() (skipped when NumPy is not
+installed). Each runs over a memory-mapped parser and reports MB/s and records/s.
+
+Usage:
+    python -m benchmarks.binary_parser_records [--records N]
+"""
+import argparse
+import collections
+import os
+import tempfile
+import time
+
+from brent.binary_execution.parser import BinaryParser, RecordSchema
+
+SCHEMA = RecordSchema([('id', 'I'), ('timestamp', 'q'), ('value', 'd'), ('flags', 'H'), (None, '2x'), ('tag', '8s')])
+
+def per_call(parser, count):
+    size = SCHEMA.size
+    fmt = SCHEMA.struct.format
+    for index in range(count):
+        parser.parse_section(index * size, size, fmt)
+
+def streaming(parser, count):
+    collections.deque(parser.iter_records(SCHEMA, count=count), maxlen=0)
+
+def numpy_array(parser, count):
+    array = parser.read_array(SCHEMA, count=count)
+    array['value'].sum()
+    del array
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare BinaryParser record parsing strategies.")
+    parser.add_argument('--records', type=int, default=2000000, help="Number of records in the file.")
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile(delete=False) as binary_file:
+        record = SCHEMA.struct.pack(1, 2, 3.0, 4, b"tag")
+        for start in range(0, args.records, 100000):
+            binary_file.write(record * min(100000, args.records - start))
+        path = binary_file.name
+    try:
+        count = os.path.getsize(path) // SCHEMA.size
+        try:
+            # Import NumPy now so its import time is not counted against read_array().
+            SCHEMA.numpy_dtype()
+        except ImportError:
+            pass
+        with BinaryParser(path, use_mmap=True) as mapped:
+            for name, run in (('parse_section', per_call), ('iter_records', streaming), ('read_array', numpy_array)):
+                start_time = time.perf_counter()
+                try:
+                    run(mapped, count)
+                except ImportError as e:
+                    print(f"{name:<14} skipped: {e}")
+                    continue
+                elapsed = time.perf_counter() - start_time
+                print(f"{name:<14} {count * SCHEMA.size / elapsed / 1e6:>10.1f} MB/s {count / elapsed:>14.1f} records/s")
+    finally:
+        os.unlink(path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Small-message throughput benchmark for batched CustomProtocol framing.
+
+Tiny messages go through a socketpair, either one send_message()/receive_message() call per
+message or with send_messages() coalescing frames into large writes and receive_messages()
+decoding every complete frame of each recv.
+
+Usage:
+    python -m benchmarks.custom_protocol_batching [--messages N] [--size BYTES] [--flush-size BYTES]
+"""
+import argparse
+import socket
+import threading
+import time
+
+from brent.network.protocols.custom_protocol import CustomProtocol
+
+def _pair():
+    left, right = socket.socketpair()
+    sender = CustomProtocol(None, None)
+    sender.socket = left
+    receiver = CustomProtocol(None, None)
+    receiver.socket = right
+    return sender, receiver
+
+def run_single(messages):
+    """
+    Send and receive the messages one call at a time.
+
+    :return: Elapsed seconds.
+    """
+    sender, receiver = _pair()
+    writer = threading.Thread(target=lambda: [sender.send_message(message) for message in messages])
+    start_time = time.perf_counter()
+    writer.start()
+    for _ in messages:
+        receiver.receive_message()
+    writer.join()
+    elapsed = time.perf_counter() - start_time
+    sender.close()
+    receiver.close()
+    return elapsed
+
+def run_batched(messages, flush_size):
+    """
+    Send the messages with send_messages() and receive them with receive_messages().
+
+    :return: Elapsed seconds.
+    """
+    sender, receiver = _pair()
+    writer = threading.Thread(target=sender.send_messages, args=(messages, flush_size))
+    start_time = time.perf_counter()
+    writer.start()
+    received = 0
+    while received < len(messages):
+        received += len(receiver.receive_messages())
+    writer.join()
+    elapsed = time.perf_counter() - start_time
+    sender.close()
+    receiver.close()
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-message and batched CustomProtocol framing.")
+    parser.add_argument('--messages', type=int, default=200000, help="Number of messages.")
+    parser.add_argument('--size', type=int, default=32, help="Message size in bytes.")
+    parser.add_argument('--flush-size', type=int, default=65536, help="Batch size in bytes for send_messages().")
+    args = parser.parse_args()
+
+    messages = ["x" * args.size] * args.messages
+    elapsed = run_single(messages)
+    print(f"{'send_message/receive_message':<30} {args.messages / elapsed:>12.1f} msgs/s")
+    elapsed = run_batched(messages, args.flush_size)
+    print(f"{'send_messages/receive_messages':<30} {args.messages / elapsed:>12.1f} msgs/s")
+
+if __name__ == "__main__":
+    main()
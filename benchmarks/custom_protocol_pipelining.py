@@ -0,0 +1,128 @@
+"""
+Loopback benchmark for the blocking CustomProtocol and the pipelining AsyncCustomProtocol.
+
+An asyncio echo server speaking the `!I` length-prefixed framing runs on a background thread.
+The blocking client does one round trip per message; the async client keeps a window of
+messages in flight on each of several connections.
+
+Usage:
+    python -m benchmarks.custom_protocol_pipelining [--messages N] [--size BYTES] [--connections N] [--window N]
+"""
+import argparse
+import asyncio
+import struct
+import threading
+import time
+
+from brent.network.protocols.async_custom_protocol import AsyncCustomProtocol
+from brent.network.protocols.custom_protocol import CustomProtocol
+
+class EchoServer:
+    """
+    Echo server for the length-prefixed protocol, running its own event loop on a thread.
+    """
+    def __init__(self, host='127.0.0.1'):
+        self.host = host
+        self.port = None
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        self.ready.wait()
+        return self
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        server = self.loop.run_until_complete(asyncio.start_server(self._echo, self.host, 0))
+        self.port = server.sockets[0].getsockname()[1]
+        self.ready.set()
+        self.loop.run_forever()
+        server.close()
+        self.loop.run_until_complete(server.wait_closed())
+        self.loop.close()
+
+    async def _echo(self, reader, writer):
+        try:
+            while True:
+                header = await reader.readexactly(CustomProtocol.HEADER_SIZE)
+                length = struct.unpack(CustomProtocol.HEADER_FORMAT, header)[0]
+                writer.write(header + await reader.readexactly(length))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+def run_blocking(port, message, count):
+    """
+    Send count messages one round trip at a time.
+
+    :return: Elapsed seconds.
+    """
+    client = CustomProtocol('127.0.0.1', port)
+    client.connect()
+    start_time = time.perf_counter()
+    for _ in range(count):
+        client.send_message(message)
+        client.receive_message()
+    elapsed = time.perf_counter() - start_time
+    client.close()
+    return elapsed
+
+async def run_pipelined(port, message, count, connections, window):
+    """
+    Send count messages spread over several connections, keeping up to window messages in flight on each.
+
+    :return: A tuple of (elapsed seconds, number of messages sent).
+    """
+    clients = [AsyncCustomProtocol('127.0.0.1', port) for _ in range(connections)]
+    for client in clients:
+        await client.connect()
+
+    async def drive(client, share):
+        in_flight = []
+        for _ in range(share):
+            in_flight.append(client.send_message(message))
+            if len(in_flight) >= window:
+                await client.drain()
+                await asyncio.gather(*in_flight)
+                in_flight = []
+        await client.drain()
+        await asyncio.gather(*in_flight)
+
+    start_time = time.perf_counter()
+    share = count // connections
+    await asyncio.gather(*(drive(client, share) for client in clients))
+    elapsed = time.perf_counter() - start_time
+    for client in clients:
+        await client.close()
+    return elapsed, share * connections
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare blocking and pipelined CustomProtocol clients on loopback.")
+    parser.add_argument('--messages', type=int, default=20000, help="Messages sent by each client.")
+    parser.add_argument('--size', type=int, default=64, help="Message size in bytes.")
+    parser.add_argument('--connections', type=int, default=8, help="Connections used by the async client.")
+    parser.add_argument('--window', type=int, default=64, help="Messages in flight per async connection.")
+    args = parser.parse_args()
+
+    message = "x" * args.size
+    server = EchoServer().start()
+    try:
+        elapsed = run_blocking(server.port, message, args.messages)
+        print(f"{'blocking, 1 connection':<36} {args.messages / elapsed:>12.1f} msgs/s")
+        elapsed, sent = asyncio.run(run_pipelined(server.port, message, args.messages, 1, args.window))
+        print(f"{'pipelined, 1 connection':<36} {sent / elapsed:>12.1f} msgs/s")
+        elapsed, sent = asyncio.run(run_pipelined(server.port, message, args.messages, args.connections, args.window))
+        print(f"{f'pipelined, {args.connections} connections':<36} {sent / elapsed:>12.1f} msgs/s")
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
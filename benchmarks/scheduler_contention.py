@@ -0,0 +1,80 @@
+"""
+Producer contention benchmark for NetworkTaskScheduler and ShardedNetworkTaskScheduler.
+
+Several producer threads submit no-op tasks at the same time. The single-queue scheduler
+serializes every add and every pop on one lock; the sharded scheduler gives each producer its
+own shard and lets idle workers steal, so adding more producers should not slow it down.
+
+Usage:
+    python -m benchmarks.scheduler_contention [--tasks N] [--workers N] [--producers 1 4 16]
+"""
+import argparse
+import threading
+import time
+
+from brent.network.scheduler import NetworkTaskScheduler
+from brent.network.sharded_scheduler import ShardedNetworkTaskScheduler
+
+def run_benchmark(scheduler, task_count, producer_count):
+    """
+    Submit task_count no-op tasks from producer_count threads and wait until all of them have run.
+
+    :param scheduler: The scheduler under test.
+    :param task_count: Total number of tasks to submit.
+    :param producer_count: Number of producer threads.
+    :return: A tuple of (elapsed seconds, mean add_task latency in seconds).
+    """
+    remaining = [task_count]
+    remaining_lock = threading.Lock()
+    done = threading.Event()
+    add_times = []
+    start_barrier = threading.Barrier(producer_count + 1)
+
+    def action():
+        with remaining_lock:
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                done.set()
+
+    def produce(producer, count):
+        start_barrier.wait()
+        started_at = time.perf_counter()
+        for index in range(count):
+            scheduler.add_task(index % 10, f"task-{producer}-{index}", action)
+        add_times.append((time.perf_counter() - started_at) / max(1, count))
+
+    per_producer = task_count // producer_count
+    counts = [per_producer] * producer_count
+    counts[-1] += task_count - per_producer * producer_count
+    producers = [threading.Thread(target=produce, args=(producer, count))
+                 for producer, count in enumerate(counts)]
+    for producer in producers:
+        producer.start()
+    start_barrier.wait()
+    start_time = time.perf_counter()
+    for producer in producers:
+        producer.join()
+    done.wait()
+    elapsed = time.perf_counter() - start_time
+    scheduler.stop()
+    return elapsed, sum(add_times) / len(add_times)
+
+def format_result(name, producer_count, task_count, elapsed, add_latency):
+    return (f"{name:<10} {producer_count:>3} producers  {task_count / elapsed:>12.1f} tasks/s  "
+            f"add_task {add_latency * 1e6:>8.2f} us")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scheduler throughput under producer contention.")
+    parser.add_argument('--tasks', type=int, default=50000, help="Total tasks submitted per run.")
+    parser.add_argument('--workers', type=int, default=4, help="Worker threads in each scheduler.")
+    parser.add_argument('--producers', type=int, nargs='+', default=[1, 4, 16], help="Producer thread counts to test.")
+    args = parser.parse_args()
+
+    for producer_count in args.producers:
+        elapsed, add_latency = run_benchmark(NetworkTaskScheduler(num_workers=args.workers), args.tasks, producer_count)
+        print(format_result("single", producer_count, args.tasks, elapsed, add_latency))
+        elapsed, add_latency = run_benchmark(ShardedNetworkTaskScheduler(num_workers=args.workers), args.tasks, producer_count)
+        print(format_result("sharded", producer_count, args.tasks, elapsed, add_latency))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Throughput and latency benchmark for NetworkTaskScheduler.
+
+Compares the event-driven worker pool against the original single-threaded
+implementation that polled the queue every 100 ms while holding the lock.
+
+Usage:
+    python -m benchmarks.scheduler_throughput [--tasks N] [--polling-tasks N] [--workers 1 4 8]
+"""
+import argparse
+import heapq
+import statistics
+import threading
+import time
+
+from brent.network.scheduler import NetworkTask, NetworkTaskScheduler
+
+class PollingNetworkTaskScheduler:
+    """
+    Reference copy of the pre-worker-pool scheduler, kept only for comparison.
+    """
+    def __init__(self):
+        self.task_queue = []
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.worker_thread = threading.Thread(target=self._worker)
+        self.worker_thread.start()
+
+    def add_task(self, priority, task_id, action, *args, **kwargs):
+        with self.lock:
+            task = NetworkTask(priority, task_id, action, *args, **kwargs)
+            heapq.heappush(self.task_queue, task)
+
+    def _worker(self):
+        while not self.stop_event.is_set():
+            with self.lock:
+                if self.task_queue:
+                    task = heapq.heappop(self.task_queue)
+                    task.run()
+            time.sleep(0.1)
+
+    def stop(self):
+        self.stop_event.set()
+        self.worker_thread.join()
+
+def run_benchmark(scheduler, task_count):
+    """
+    Submit task_count no-op tasks and wait until all of them have started.
+
+    :param scheduler: The scheduler under test.
+    :param task_count: Number of tasks to submit.
+    :return: A tuple of (elapsed seconds, list of enqueue-to-start latencies in seconds).
+    """
+    latencies = []
+    latencies_lock = threading.Lock()
+    done = threading.Event()
+
+    def action(enqueued_at):
+        started_at = time.perf_counter()
+        with latencies_lock:
+            latencies.append(started_at - enqueued_at)
+            if len(latencies) == task_count:
+                done.set()
+
+    start_time = time.perf_counter()
+    for index in range(task_count):
+        scheduler.add_task(index % 10, f"task-{index}", action, time.perf_counter())
+    done.wait()
+    elapsed = time.perf_counter() - start_time
+    scheduler.stop()
+    return elapsed, latencies
+
+def format_result(name, task_count, elapsed, latencies):
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return (f"{name:<28} {task_count:>8} tasks  {task_count / elapsed:>12.1f} tasks/s  "
+            f"latency p50 {statistics.median(ordered) * 1000:>9.3f} ms  p99 {p99 * 1000:>9.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark NetworkTaskScheduler throughput and latency.")
+    parser.add_argument('--tasks', type=int, default=20000, help="Tasks submitted to the event-driven scheduler.")
+    parser.add_argument('--polling-tasks', type=int, default=20, help="Tasks submitted to the polling baseline.")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8], help="Worker pool sizes to test.")
+    args = parser.parse_args()
+
+    elapsed, latencies = run_benchmark(PollingNetworkTaskScheduler(), args.polling_tasks)
+    print(format_result("polling (baseline)", args.polling_tasks, elapsed, latencies))
+
+    for num_workers in args.workers:
+        elapsed, latencies = run_benchmark(NetworkTaskScheduler(num_workers=num_workers), args.tasks)
+        print(format_result(f"event-driven, {num_workers} workers", args.tasks, elapsed, latencies))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import collections
+import os
+import pickle
+import sys
+import threading
+
+class ParseCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, path=None):
+        """
+        Initialize an LRU cache of BinaryParser results keyed by file identity.
+
+        Keys are (device, inode, size, mtime_ns, offset, fmt), so a file that is modified, replaced or
+        truncated gets new keys and is parsed again; the entries of its previous version are dropped
+        the first time the change is seen. Least recently used entries are evicted once the estimated
+        size of the cached results exceeds max_bytes.
+
+        :param max_bytes: Budget for the estimated size of the cached results (default: 64 MiB).
+        :param path: File the cache is loaded from and saved to with save() or close(), to keep it
+                     across restarts, or None to keep it in memory only (default: None). It is read with
+                     pickle, so it must only be writable by trusted users.
+        """
+        if max_bytes < 0:
+            raise ValueError("max_bytes must not be negative.")
+        self.max_bytes = max_bytes
+        self.path = path
+        self.entries = collections.OrderedDict()
+        self.sizes = {}
+        # (device, inode) -> (size, mtime_ns) of the version of the file the cached entries belong to.
+        self.versions = {}
+        self.size = 0
+        self.stats = collections.Counter(hits=0, misses=0, evictions=0, invalidations=0)
+        self.lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            self._load()
+
+    @staticmethod
+    def file_identity(binary_file):
+        """
+        Get the identity of the current version of a file.
+
+        Pass the descriptor of the file that is actually read, so a file replaced at its path after it
+        was opened or mapped is not mistaken for the one being parsed.
+
+        :param binary_file: Path to the file, or an open file descriptor.
+        :return: A tuple of (device, inode, size, mtime_ns).
+        """
+        stat = os.stat(binary_file)
+        return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def key(self, binary_file, offset, fmt):
+        """
+        Build the cache key for a parse of the current version of a file.
+
+        :param binary_file: Path to the file, or an open file descriptor; see file_identity().
+        :param offset: Offset of the parsed section.
+        :param fmt: Format string of the parsed section, or None for BinaryParser.parse().
+        :return: A tuple usable with get() and put().
+        """
+        return self.file_identity(binary_file) + (offset, fmt)
+
+    def get(self, key, default=None):
+        """
+        Look up a cached result and mark it as recently used.
+
+        :param key: A key from key().
+        :param default: Returned when the result is not cached (default: None).
+        :return: The cached result, or default.
+        """
+        with self.lock:
+            self._check_version(key)
+            try:
+                value = self.entries[key]
+            except KeyError:
+                self.stats['misses'] += 1
+                return default
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Cache a result, evicting the least recently used results if the budget is exceeded.
+
+        A result larger than the whole budget is not cached.
+
+        :param key: A key from key().
+        :param value: The parse result; tuples, dicts and their values are sized shallowly.
+        """
+        size = _estimate_size(key, value)
+        with self.lock:
+            self._check_version(key)
+            self._remove(key)
+            if size > self.max_bytes:
+                return
+            self.entries[key] = value
+            self.sizes[key] = size
+            self.size += size
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.stats['evictions'] += 1
+
+    def _check_version(self, key):
+        identity, version = key[:2], key[2:4]
+        current = self.versions.get(identity)
+        if current == version:
+            return
+        if current is not None:
+            # The file changed since its results were cached; they can never be hit again.
+            stale = [entry for entry in self.entries if entry[:4] == identity + current]
+            for entry in stale:
+                self._remove(entry)
+            self.stats['invalidations'] += len(stale)
+        self.versions[identity] = version
+
+    def _remove(self, key):
+        if key in self.entries:
+            del self.entries[key]
+            self.size -= self.sizes.pop(key)
+
+    def invalidate(self, binary_path=None):
+        """
+        Drop cached results.
+
+        :param binary_path: Only drop the results for this file, or None to drop everything (default: None).
+        """
+        with self.lock:
+            if binary_path is None:
+                stale = list(self.entries)
+                self.versions.clear()
+            else:
+                stat = os.stat(binary_path)
+                identity = (stat.st_dev, stat.st_ino)
+                stale = [entry for entry in self.entries if entry[:2] == identity]
+                self.versions.pop(identity, None)
+            for entry in stale:
+                self._remove(entry)
+            self.stats['invalidations'] += len(stale)
+
+    def get_size(self):
+        """
+        Get the estimated size of the cached results.
+
+        :return: The size in bytes.
+        """
+        with self.lock:
+            return self.size
+
+    def get_stats(self):
+        """
+        Get the cache counters.
+
+        :return: A dictionary with hits, misses, evictions, invalidations and the number of entries.
+        """
+        with self.lock:
+            return dict(self.stats, entries=len(self.entries))
+
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as cache_file:
+                entries = pickle.load(cache_file)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError, TypeError) as e:
+            print(f"Failed to load the parse cache from '{self.path}': {e}")
+            return
+        # Oldest first, so the saved recency order is kept; stale entries age out or are dropped on use.
+        for key, value in entries:
+            self.put(key, value)
+
+    def save(self):
+        """
+        Write the cache to its path, replacing the previous file atomically.
+        """
+        if self.path is None:
+            raise ValueError("The cache has no path to save to.")
+        with self.lock:
+            entries = list(self.entries.items())
+        temporary_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'wb') as cache_file:
+            pickle.dump(entries, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, self.path)
+
+    def close(self):
+        """
+        Save the cache if it has a path.
+        """
+        if self.path is not None:
+            self.save()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def _estimate_size(key, value):
+    items = value.values() if isinstance(value, dict) else value if isinstance(value, (tuple, list)) else ()
+    return (sys.getsizeof(key) + sum(sys.getsizeof(part) for part in key)
+            + sys.getsizeof(value) + sum(sys.getsizeof(item) for item in items))
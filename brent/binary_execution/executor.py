@@ -1,5 +1,52 @@
+import asyncio
 import os
+import signal
 import subprocess
+import time
+
+class ExecutionResult:
+    def __init__(self, index, args, returncode, stdout, stderr, duration, timed_out=False):
+        """
+        Initialize the result of one invocation from BinaryExecutor.execute_many().
+
+        :param index: Position of the invocation's arguments in the list passed to execute_many().
+        :param args: The arguments the binary was run with.
+        :param returncode: The exit code, negative for a signal, or None if the binary could not be started.
+        :param stdout: Standard output as a string.
+        :param stderr: Standard error as a string, or the reason the binary could not be started.
+        :param duration: Wall-clock seconds from starting the process until it exited.
+        :param timed_out: Whether the process was killed because it exceeded its timeout.
+        """
+        self.index = index
+        self.args = args
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.duration = duration
+        self.timed_out = timed_out
+
+    def __repr__(self):
+        return (f"ExecutionResult(index={self.index}, returncode={self.returncode}, "
+                f"duration={self.duration:.3f}, timed_out={self.timed_out})")
+
+async def _drain(stream, buffer):
+    # Reads into a buffer owned by the caller, so output read before a timeout is kept.
+    while True:
+        chunk = await stream.read(65536)
+        if not chunk:
+            return
+        buffer += chunk
+
+def _kill(process):
+    # On POSIX the process leads its own process group, so children it started (e.g. from a shell
+    # script) die with it and release the output pipes.
+    try:
+        if os.name == 'posix':
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
 
 class BinaryExecutor:
     def __init__(self, binary_path):
@@ -67,3 +114,88 @@ class BinaryExecutor:
         except subprocess.CalledProcessError as e:
             print(f"Execution failed: {e}")
             return e.output
+
+    def execute_many(self, arg_lists, max_concurrency=8, timeout=None):
+        """
+        Run the binary once per argument list, several at a time, yielding results as they complete.
+
+        Each invocation is started with asyncio.create_subprocess_exec on a private event loop, so no
+        thread is tied up per process. Closing the generator early (or breaking out of the loop over
+        it) kills the processes that are still running and starts no more. From a coroutine, use
+        execute_many_async() instead.
+
+        :param arg_lists: Iterable of argument lists, one per invocation.
+        :param max_concurrency: Maximum number of processes running at once (default: 8).
+        :param timeout: Seconds each invocation may run before it is killed, or None for no limit (default: None).
+        :return: A generator of ExecutionResult in completion order; use result.index to match inputs.
+        """
+        loop = asyncio.new_event_loop()
+        results = self.execute_many_async(arg_lists, max_concurrency, timeout)
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(results.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            loop.run_until_complete(results.aclose())
+            loop.close()
+
+    async def execute_many_async(self, arg_lists, max_concurrency=8, timeout=None):
+        """
+        Run the binary once per argument list, several at a time, yielding results as they complete.
+
+        Cancelling the task that iterates, or closing the iterator, kills the processes that are still
+        running and starts no more.
+
+        :param arg_lists: Iterable of argument lists, one per invocation.
+        :param max_concurrency: Maximum number of processes running at once (default: 8).
+        :param timeout: Seconds each invocation may run before it is killed, or None for no limit (default: None).
+        :return: An async generator of ExecutionResult in completion order.
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
+        queued = enumerate(arg_lists)
+        running = set()
+        try:
+            while True:
+                for index, args in queued:
+                    running.add(asyncio.ensure_future(self._execute_one(index, list(args), timeout)))
+                    if len(running) >= max_concurrency:
+                        break
+                if not running:
+                    return
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                # Wait for the cancelled calls to kill and reap their processes.
+                await asyncio.gather(*running, return_exceptions=True)
+
+    async def _execute_one(self, index, args, timeout):
+        start_time = time.perf_counter()
+        try:
+            process = await asyncio.create_subprocess_exec(self.binary_path, *args, stdin=subprocess.DEVNULL,
+                                                           stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                                           start_new_session=os.name == 'posix')
+        except OSError as e:
+            print(f"Execution failed: {e}")
+            return ExecutionResult(index, args, None, "", str(e), time.perf_counter() - start_time)
+        stdout = bytearray()
+        stderr = bytearray()
+        timed_out = False
+        try:
+            await asyncio.wait_for(asyncio.gather(process.wait(), _drain(process.stdout, stdout),
+                                                  _drain(process.stderr, stderr)), timeout)
+        except asyncio.TimeoutError:
+            timed_out = True
+        finally:
+            if process.returncode is None:
+                # Timed out or cancelled: do not leave the process running or unreaped.
+                _kill(process)
+                await process.wait()
+        return ExecutionResult(index, args, process.returncode, stdout.decode('utf-8', 'replace'),
+                               stderr.decode('utf-8', 'replace'), time.perf_counter() - start_time, timed_out)
@@ -1,15 +1,192 @@
+import collections
+import functools
+import itertools
+import mmap
+import os
 import struct
+from concurrent.futures import ProcessPoolExecutor
+
+# Compiled layouts shared by every parser, so a format string is only interpreted once per process.
+_structs = {}
+
+def get_struct(fmt):
+    """
+    Get the compiled struct.Struct for a format string, compiling it on first use.
+
+    :param fmt: Format string as accepted by the struct module.
+    :return: The cached struct.Struct.
+    """
+    layout = _structs.get(fmt)
+    if layout is None:
+        layout = _structs[fmt] = struct.Struct(fmt)
+    return layout
+
+# struct code -> numpy kind; integer sizes come from struct.calcsize so native 'l' and 'n' map correctly.
+_NUMPY_KINDS = {'b': 'i', 'h': 'i', 'i': 'i', 'l': 'i', 'q': 'i', 'n': 'i',
+                'B': 'u', 'H': 'u', 'I': 'u', 'L': 'u', 'Q': 'u', 'N': 'u',
+                'e': 'f', 'f': 'f', 'd': 'f', '?': 'b', 'c': 'S', 's': 'S'}
+_NUMPY_BYTE_ORDERS = {'@': '=', '=': '=', '<': '<', '>': '>', '!': '>'}
+
+class RecordSchema:
+    def __init__(self, fields, byte_order='<'):
+        """
+        Initialize a fixed-size record layout from named struct fields.
+
+        The fields are compiled into a single struct.Struct, so a whole record is unpacked in one call.
+
+        :param fields: List of (name, code) pairs, e.g. [('id', 'I'), ('value', 'd'), ('tag', '8s')].
+                       Each code must produce one value; use a name of None for padding such as '4x'.
+        :param byte_order: struct byte order and alignment prefix: '<', '>', '!', '=' or '@' (default: '<').
+        """
+        if byte_order not in _NUMPY_BYTE_ORDERS:
+            raise ValueError(f"byte_order must be one of {sorted(_NUMPY_BYTE_ORDERS)}.")
+        # Kept as given, padding included, so the schema can be rebuilt in a worker process.
+        self.layout = [tuple(field) for field in fields]
+        self.fields = []
+        self.offsets = []
+        prefix = ''
+        for name, code in self.layout:
+            count = len(struct.Struct(byte_order + code).unpack(bytes(struct.calcsize(byte_order + code))))
+            if count != (0 if name is None else 1):
+                raise ValueError(f"Field {name!r} has code {code!r}, which produces {count} values.")
+            if name is not None:
+                # Where the field starts, after any alignment padding that precedes it.
+                self.offsets.append(struct.calcsize(byte_order + prefix + code) - struct.calcsize(byte_order + code))
+                self.fields.append((name, code))
+            prefix += code
+        self.byte_order = byte_order
+        self.names = tuple(name for name, _ in self.fields)
+        self.struct = get_struct(byte_order + prefix)
+        self.size = self.struct.size
+        if self.size == 0:
+            raise ValueError("A record schema needs at least one byte.")
+        self.record_type = collections.namedtuple('Record', self.names)
+
+    def __reduce__(self):
+        # The compiled struct and the generated record type cannot be pickled; recompile instead.
+        return RecordSchema, (self.layout, self.byte_order)
+
+    def unpack_from(self, buffer, offset=0):
+        """
+        Unpack one record as a tuple of field values.
+
+        :param buffer: A bytes-like object.
+        :param offset: Where the record starts in the buffer (default: 0).
+        :return: A tuple in field order.
+        """
+        return self.struct.unpack_from(buffer, offset)
+
+    def numpy_dtype(self):
+        """
+        Build the equivalent NumPy structured dtype, including any padding.
+
+        :return: A numpy.dtype whose itemsize equals the record size.
+        """
+        numpy = _import_numpy()
+        byte_order = _NUMPY_BYTE_ORDERS[self.byte_order]
+        formats = []
+        for name, code in self.fields:
+            kind = _NUMPY_KINDS.get(code[-1])
+            if kind is None:
+                raise ValueError(f"Field {name!r} with code {code!r} has no NumPy equivalent.")
+            size = struct.calcsize(self.byte_order + code)
+            formats.append(f"S{size}" if kind == 'S' else '?' if kind == 'b' else f"{byte_order}{kind}{size}")
+        return numpy.dtype({'names': list(self.names), 'formats': formats, 'offsets': self.offsets,
+                            'itemsize': self.size})
+
+class DelimitedFormat:
+    def __init__(self, marker, length_format='<I'):
+        """
+        Initialize a layout of variable-length records, each framed as marker + length + payload.
+
+        The marker lets a reader that starts at an arbitrary byte offset, or that runs into a corrupt
+        record, find the next record boundary again. A candidate marker is only accepted if the record
+        it starts is followed by another marker or by the end of the file, which rules out most markers
+        that happen to occur inside a payload.
+
+        :param marker: Non-empty bytes that start every record, e.g. b"\xf0\x9f\x93\xa6".
+        :param length_format: struct format of the payload length that follows the marker (default: '<I').
+        """
+        if not marker:
+            raise ValueError("The marker must not be empty.")
+        self.marker = bytes(marker)
+        self.length_format = length_format
+        self.length = get_struct(length_format)
+        self.header_size = len(self.marker) + self.length.size
+
+    def __reduce__(self):
+        return DelimitedFormat, (self.marker, self.length_format)
+
+    def encode(self, payload):
+        """
+        Frame a payload as one record.
+
+        :param payload: The payload as bytes.
+        :return: The framed record as bytes.
+        """
+        return self.marker + self.length.pack(len(payload)) + payload
+
+def _parse_chunk(binary_path, layout, function, start, end, resync):
+    # Runs in a worker process, against the worker's own mapping of the file.
+    with BinaryParser(binary_path, use_mmap=True) as parser:
+        if isinstance(layout, RecordSchema):
+            records = parser.iter_records(layout, start, (end - start) // layout.size)
+        else:
+            records = parser.iter_delimited(layout, start, end, resync)
+        result = list(records) if function is None else function(records)
+        # Drop the iterator, and with it any view of the mapping, before the file is unmapped.
+        del records
+    return result
+
+def _import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("NumPy is required for structured-array parsing; install it with 'pip install numpy'.")
+    return numpy
 
 class BinaryParser:
-    def __init__(self, binary_path):
+    # Bytes read per chunk when iterating without a memory map.
+    ITER_CHUNK_SIZE = 1024 * 1024
+
+    HEADER = struct.Struct('I')
+    VALUE = struct.Struct('d')
+
+    def __init__(self, binary_path, use_mmap=False, cache=None):
         """
         Initialize the BinaryParser with the path to the binary file.
 
+        With use_mmap=True the file is mapped into memory once and every parse reads straight from
+        the mapping through a memoryview: no reopening, seeking or copying into new bytes objects per
+        call. Call close() (or use the parser as a context manager) to unmap it.
+
         :param binary_path: Path to the binary file to be parsed.
+        :param use_mmap: Map the file once instead of reading it on every call (default: False).
+        :param cache: A ParseCache, possibly shared by many parsers, that parse() and parse_section()
+                      results are looked up in first; None disables caching (default: None).
         """
         if not os.path.isfile(binary_path):
             raise FileNotFoundError(f"The binary file '{binary_path}' does not exist.")
         self.binary_path = binary_path
+        self.use_mmap = use_mmap
+        self.cache = cache
+        self.mmap = None
+        self.view = None
+        # Identity of the mapped file, which stays the same when the path is replaced later.
+        self.identity = None
+        if use_mmap:
+            self._map()
+
+    def _map(self):
+        with open(self.binary_path, 'rb') as binary_file:
+            stat = os.fstat(binary_file.fileno())
+            self.identity = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+            if stat.st_size == 0:
+                # Empty files cannot be mapped; every read from them fails the same way anyway.
+                self.view = memoryview(b"")
+                return
+            self.mmap = mmap.mmap(binary_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mmap)
 
     def parse(self):
         """
@@ -17,16 +194,39 @@ class BinaryParser:
 
         :return: Parsed data from the binary file.
         """
-        parsed_data = {}
+        if self.use_mmap:
+            view = self._require_view()
+            return self._cached(0, None, lambda: {
+                'header': self.HEADER.unpack_from(view, 0)[0],
+                'value': self.VALUE.unpack_from(view, 4)[0],
+                'name': str(view[12:28], 'utf-8').strip('\x00'),
+            })
         with open(self.binary_path, 'rb') as binary_file:
-            # Example: Parse the first 4 bytes as an integer
-            parsed_data['header'] = struct.unpack('I', binary_file.read(4))[0]
-            # Example: Parse the next 8 bytes as a double
-            parsed_data['value'] = struct.unpack('d', binary_file.read(8))[0]
-            # Example: Parse the next 16 bytes as a string
-            parsed_data['name'] = binary_file.read(16).decode('utf-8').strip('\x00')
+            return self._cached(0, None, lambda: self._parse(binary_file), binary_file)
+
+    def _parse(self, binary_file):
+        parsed_data = {}
+        # Example: Parse the first 4 bytes as an integer
+        parsed_data['header'] = self.HEADER.unpack(binary_file.read(4))[0]
+        # Example: Parse the next 8 bytes as a double
+        parsed_data['value'] = self.VALUE.unpack(binary_file.read(8))[0]
+        # Example: Parse the next 16 bytes as a string
+        parsed_data['name'] = binary_file.read(16).decode('utf-8').strip('\x00')
         return parsed_data
 
+    def _cached(self, offset, fmt, parse, binary_file=None):
+        # Keyed by the file that is actually read: the mapped one, or the one just opened.
+        if self.cache is None:
+            return parse()
+        identity = self.identity if binary_file is None else self.cache.file_identity(binary_file.fileno())
+        key = identity + (offset, fmt)
+        result = self.cache.get(key)
+        if result is None:
+            result = parse()
+            self.cache.put(key, result)
+        # A copy of a parse() dictionary, so callers cannot change the cached result.
+        return dict(result) if isinstance(result, dict) else result
+
     def parse_section(self, offset, size, fmt):
         """
         Parse a specific section of the binary file.
@@ -36,9 +236,245 @@ class BinaryParser:
         :param fmt: Format string for struct.unpack to parse the data.
         :return: Parsed data from the specified section.
         """
+        layout = get_struct(fmt)
+        if size != layout.size and self.cache is not None:
+            # size is not part of the cache key, so reject a mismatch before a cached result could hide it.
+            raise struct.error(f"unpack requires a buffer of {layout.size} bytes")
+        if self.use_mmap:
+            view = self._require_view()
+            # Same checks as unpacking a read of `size` bytes, without reading anything.
+            if size != layout.size or offset < 0 or offset + size > len(view):
+                raise struct.error(f"unpack requires a buffer of {layout.size} bytes")
+            return self._cached(offset, fmt, lambda: layout.unpack_from(view, offset))
+        with open(self.binary_path, 'rb') as binary_file:
+            return self._cached(offset, fmt, lambda: self._read_section(binary_file, offset, size, layout),
+                                binary_file)
+
+    def _read_section(self, binary_file, offset, size, layout):
+        binary_file.seek(offset)
+        section_data = binary_file.read(size)
+        return layout.unpack(section_data)
+
+    def section_view(self, offset, size):
+        """
+        Get a section of the mapped file without copying it.
+
+        The view stays valid until close(); release it (or let it be garbage collected) before closing.
+
+        :param offset: Offset in the binary file where the section starts.
+        :param size: Number of bytes in the section.
+        :return: A read-only memoryview of the section.
+        """
+        view = self._require_view()
+        if offset < 0 or offset + size > len(view):
+            raise ValueError(f"Section {offset}:{offset + size} is outside the file of {len(view)} bytes.")
+        return view[offset:offset + size]
+
+    def _record_count(self, schema, offset, count):
+        file_size = len(self.view) if self.use_mmap else os.path.getsize(self.binary_path)
+        if offset < 0 or offset > file_size:
+            raise ValueError(f"Offset {offset} is outside the file of {file_size} bytes.")
+        available = (file_size - offset) // schema.size
+        if count is None:
+            return available
+        if count > available:
+            raise ValueError(f"Only {available} records of {schema.size} bytes fit after offset {offset}.")
+        return count
+
+    def iter_records(self, schema, offset=0, count=None, named=False):
+        """
+        Stream fixed-size records with one struct.iter_unpack pass instead of a call per record.
+
+        In memory-mapped mode the records are unpacked straight from the mapping. Otherwise the file
+        is read in chunks of about ITER_CHUNK_SIZE bytes, so memory use stays bounded.
+
+        :param schema: A RecordSchema.
+        :param offset: Where the first record starts (default: 0).
+        :param count: Number of records, or None for every whole record up to the end of the file.
+        :param named: Yield schema.record_type named tuples instead of plain tuples (default: False).
+        :return: An iterator of records.
+        """
+        count = self._record_count(schema, offset, count)
+        records = self._iter_tuples(schema, offset, count)
+        return map(schema.record_type._make, records) if named else records
+
+    def _iter_tuples(self, schema, offset, count):
+        if self.use_mmap:
+            view = self._require_view()
+            yield from schema.struct.iter_unpack(view[offset:offset + count * schema.size])
+            return
+        per_chunk = max(1, self.ITER_CHUNK_SIZE // schema.size)
         with open(self.binary_path, 'rb') as binary_file:
             binary_file.seek(offset)
-            section_data = binary_file.read(size)
-            parsed_section = struct.unpack(fmt, section_data)
-        return parsed_section
+            chunk = bytearray(per_chunk * schema.size)
+            while count:
+                records = min(count, per_chunk)
+                view = memoryview(chunk)[:records * schema.size]
+                if binary_file.readinto(view) != len(view):
+                    raise ValueError(f"The file '{self.binary_path}' changed while it was read.")
+                # Materialize the chunk before the buffer is refilled.
+                yield from list(schema.struct.iter_unpack(view))
+                view.release()
+                count -= records
+
+    def read_array(self, schema, offset=0, count=None):
+        """
+        Read records as one NumPy structured array with numpy.frombuffer, without a Python loop.
+
+        In memory-mapped mode the array is a read-only view of the mapping: copy it, or delete it
+        before close(). Otherwise it is backed by a freshly read buffer.
+
+        :param schema: A RecordSchema.
+        :param offset: Where the first record starts (default: 0).
+        :param count: Number of records, or None for every whole record up to the end of the file.
+        :return: A numpy.ndarray with schema.numpy_dtype().
+        :raises ImportError: If NumPy is not installed.
+        """
+        numpy = _import_numpy()
+        dtype = schema.numpy_dtype()
+        count = self._record_count(schema, offset, count)
+        if self.use_mmap:
+            return numpy.frombuffer(self._require_view(), dtype, count, offset)
+        data = bytearray(count * schema.size)
+        with open(self.binary_path, 'rb') as binary_file:
+            binary_file.seek(offset)
+            if binary_file.readinto(data) != len(data):
+                raise ValueError(f"The file '{self.binary_path}' changed while it was read.")
+        return numpy.frombuffer(data, dtype, count)
+
+    def iter_delimited(self, layout, start=0, end=None, resync=False):
+        """
+        Stream the payloads of length-delimited records.
+
+        Records are walked by their lengths. A record is only accepted if it is followed by another
+        record header or by the end of the file, the same test used to find boundaries, so a corrupt
+        length cannot derail the walk. Otherwise the bytes up to the next accepted record are skipped
+        and reported; this includes the record just before a corrupt one.
+
+        :param layout: A DelimitedFormat.
+        :param start: Offset of the first record, or where to start looking for one (default: 0).
+        :param end: Stop at the first record that starts at or after this offset; records that start
+                    before it are read to their end (default: the end of the file).
+        :param resync: Treat start as an arbitrary offset and search for the first record boundary
+                       from there, instead of expecting a record at start (default: False).
+        :return: An iterator of payloads as bytes.
+        """
+        if not self.use_mmap:
+            with BinaryParser(self.binary_path, use_mmap=True) as parser:
+                yield from parser.iter_delimited(layout, start, end, resync)
+            return
+        view = self._require_view()
+        end = len(view) if end is None else min(end, len(view))
+        position = self._find_record(layout, start, end) if resync else start
+        while position is not None and position < end:
+            length = self._accepted_length(layout, position)
+            if length is None:
+                skipped_from = position
+                position = self._find_record(layout, position + 1, end)
+                print(f"Skipped {(position if position is not None else end) - skipped_from} corrupt bytes "
+                      f"at offset {skipped_from} of '{self.binary_path}'.")
+                continue
+            payload_start = position + layout.header_size
+            position = payload_start + length
+            yield bytes(view[payload_start:position])
+
+    def _record_length(self, layout, position):
+        # The payload length of the record at position, or None if no complete record starts there.
+        view = self.view
+        marker_end = position + len(layout.marker)
+        if position + layout.header_size > len(view) or view[position:marker_end] != layout.marker:
+            return None
+        length = layout.length.unpack_from(view, marker_end)[0]
+        if position + layout.header_size + length > len(view):
+            return None
+        return length
+
+    def _accepted_length(self, layout, position):
+        # Like _record_length, but the record must also be followed by another header or by EOF.
+        length = self._record_length(layout, position)
+        if length is None:
+            return None
+        following = position + layout.header_size + length
+        if following != len(self.view) and self._record_length(layout, following) is None:
+            return None
+        return length
+
+    def _find_record(self, layout, start, end):
+        # The first offset in [start, end) where an accepted record starts.
+        while start < end:
+            position = self.mmap.find(layout.marker, start, end + len(layout.marker) - 1) if self.mmap else -1
+            if position < 0:
+                return None
+            if self._accepted_length(layout, position) is not None:
+                return position
+            start = position + 1
+        return None
+
+    def parse_parallel(self, layout, function=None, reduce=None, initial=None, offset=0, end=None,
+                       processes=None, chunk_size=64 * 1024 * 1024):
+        """
+        Parse the file in byte ranges on a pool of processes, each with its own memory map.
+
+        Fixed-size records are split on record boundaries. For length-delimited records every range
+        after the first finds its first boundary with the marker, and a record belongs to the range
+        its marker starts in. Chunk results are merged or reduced in file order.
+
+        :param layout: A RecordSchema or a DelimitedFormat.
+        :param function: Picklable function called in the worker with an iterator of the records in its
+                         range (tuples, or payload bytes for DelimitedFormat); its return value is the
+                         chunk result. None collects the records into a list (default: None).
+        :param reduce: Function combining (accumulated, chunk result), called in this process in file
+                       order as chunks finish. None returns the chunk results as a list,
+                       or, when function is None, every record as one list (default: None).
+        :param initial: Starting value for reduce. None starts from the first chunk result (default: None).
+        :param offset: Where the records start (default: 0).
+        :param end: Where the records end (default: the end of the file; fixed-size records stop at the
+                    last whole record).
+        :param processes: Number of worker processes (default: the number of CPUs).
+        :param chunk_size: Approximate bytes per range (default: 64 MiB).
+        :return: The merged records, the list of chunk results, or the reduced value.
+        """
+        file_size = os.path.getsize(self.binary_path)
+        end = file_size if end is None else min(end, file_size)
+        if isinstance(layout, RecordSchema):
+            end -= (end - offset) % layout.size
+            step = max(1, chunk_size // layout.size) * layout.size
+        else:
+            step = max(1, chunk_size)
+        starts = list(range(offset, end, step))
+        stops = starts[1:] + [end]
+        # Every range but the first starts at an arbitrary byte and has to find its first record.
+        resyncs = [False] + [True] * (len(starts) - 1)
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            # map() yields in submission order, so results are combined in file order as they finish.
+            results = pool.map(_parse_chunk, itertools.repeat(self.binary_path), itertools.repeat(layout),
+                               itertools.repeat(function), starts, stops, resyncs)
+            if reduce is not None:
+                if initial is None:
+                    return functools.reduce(reduce, results)
+                return functools.reduce(reduce, results, initial)
+            if function is None:
+                return [record for chunk in results for record in chunk]
+            return list(results)
+
+    def _require_view(self):
+        if self.view is None:
+            raise ValueError("The file is not mapped; create the parser with use_mmap=True and do not close it.")
+        return self.view
+
+    def close(self):
+        """
+        Unmap the file. Parsing afterwards raises ValueError.
+        """
+        if self.view is not None:
+            self.view.release()
+            self.view = None
+        if self.mmap is not None:
+            self.mmap.close()
+            self.mmap = None
+
+    def __enter__(self):
+        return self
 
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
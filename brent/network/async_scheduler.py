@@ -0,0 +1,124 @@
+import asyncio
+import inspect
+
+from brent.network.scheduler import NetworkTask
+
+class AsyncNetworkTaskScheduler:
+    def __init__(self, max_concurrency=100):
+        """
+        Initialize the AsyncNetworkTaskScheduler.
+
+        Tasks are coroutine functions executed on the running event loop. They are started in
+        priority order (same ordering as NetworkTask) and at most max_concurrency of them run at once.
+
+        :param max_concurrency: Maximum number of tasks running concurrently (default: 100).
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
+        self.max_concurrency = max_concurrency
+        self.task_queue = asyncio.PriorityQueue()
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.running = set()
+        self.dispatcher = None
+
+    async def start(self):
+        """
+        Start dispatching tasks on the running event loop.
+        """
+        if self.dispatcher is None:
+            self.dispatcher = asyncio.create_task(self._dispatch())
+
+    def add_task(self, priority, task_id, action, *args, **kwargs):
+        """
+        Add a coroutine task to the scheduler. Must be called from the event loop thread.
+
+        :param priority: Priority of the task (lower number means higher priority).
+        :param task_id: Unique identifier for the task.
+        :param action: The coroutine function to be executed as the task.
+        :param args: Positional arguments for the action.
+        :param kwargs: Keyword arguments for the action.
+        :return: An asyncio.Future resolved with the action's return value or exception.
+        """
+        task = NetworkTask(priority, task_id, action, *args, **kwargs)
+        task.future = asyncio.get_running_loop().create_future()
+        self.task_queue.put_nowait(task)
+        return task.future
+
+    async def _dispatch(self):
+        while True:
+            await self.semaphore.acquire()
+            task = await self.task_queue.get()
+            if task.future.done():
+                # Cancelled by the caller while still queued.
+                self.semaphore.release()
+                self.task_queue.task_done()
+                continue
+            runner = asyncio.create_task(self._run(task))
+            self.running.add(runner)
+            runner.add_done_callback(self.running.discard)
+            task.future.add_done_callback(lambda future, runner=runner: runner.cancel() if future.cancelled() else None)
+
+    async def _run(self, task):
+        try:
+            result = task.action(*task.args, **task.kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+        except asyncio.CancelledError:
+            task.future.cancel()
+            raise
+        except Exception as e:
+            if not task.future.done():
+                task.future.set_exception(e)
+        else:
+            if not task.future.done():
+                task.future.set_result(result)
+        finally:
+            self.semaphore.release()
+            self.task_queue.task_done()
+
+    async def join(self):
+        """
+        Wait until every queued and running task has finished.
+        """
+        await self.task_queue.join()
+
+    async def stop(self):
+        """
+        Stop the scheduler, cancelling running tasks and the futures of queued tasks.
+        """
+        if self.dispatcher is not None:
+            self.dispatcher.cancel()
+            await asyncio.gather(self.dispatcher, return_exceptions=True)
+            self.dispatcher = None
+        for runner in list(self.running):
+            runner.cancel()
+        await asyncio.gather(*self.running, return_exceptions=True)
+        while not self.task_queue.empty():
+            task = self.task_queue.get_nowait()
+            task.future.cancel()
+            self.task_queue.task_done()
+
+    def get_task_count(self):
+        """
+        Get the number of tasks waiting to be started.
+
+        :return: The number of tasks in the priority queue.
+        """
+        return self.task_queue.qsize()
+
+    def get_running_count(self):
+        """
+        Get the number of tasks currently running.
+
+        :return: The number of running tasks.
+        """
+        return len(self.running)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            await self.join()
+        await self.stop()
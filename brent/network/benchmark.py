@@ -0,0 +1,315 @@
+"""
+Loopback benchmark suite for the protocol clients.
+
+Stand-in echo and HTTP servers run on 127.0.0.1 in background threads, and each client does
+round trips against them across message sizes and concurrency levels. Every run reports
+throughput (msgs/s and MB/s of payload in each direction) and p50/p99/p999 round-trip latency,
+and the suite can write its results as JSON to track regressions between releases.
+
+Usage:
+    python -m brent.network.benchmark [--clients tcp custom http] [--sizes 64 4096 65536]
+                                      [--concurrency 1 8] [--messages N] [--json PATH]
+"""
+import argparse
+import datetime
+import json
+import platform
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+from brent.network.protocols.custom_protocol import CustomProtocol
+from brent.network.protocols.http import SimpleHTTPClient
+from brent.network.protocols.tcp import TCPClient
+
+PERCENTILES = (50, 99, 99.9)
+
+class _EchoHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        # Echoing raw bytes serves TCPClient and, since frames come back unchanged, CustomProtocol.
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        buffer = bytearray(65536)
+        while True:
+            try:
+                count = self.request.recv_into(buffer)
+                if not count:
+                    return
+                self.request.sendall(memoryview(buffer)[:count])
+            except OSError:
+                return
+
+class _HTTPEchoHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        # A keep-alive HTTP/1.1 stand-in that answers every request with its own body.
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        buffer = bytearray()
+        try:
+            while True:
+                end = buffer.find(b"\r\n\r\n")
+                while end < 0:
+                    data = self.request.recv(65536)
+                    if not data:
+                        return
+                    buffer += data
+                    end = buffer.find(b"\r\n\r\n")
+                length = 0
+                for line in bytes(buffer[:end]).split(b"\r\n")[1:]:
+                    name, _, value = line.partition(b":")
+                    if name.strip().lower() == b"content-length":
+                        length = int(value)
+                del buffer[:end + 4]
+                while len(buffer) < length:
+                    data = self.request.recv(65536)
+                    if not data:
+                        return
+                    buffer += data
+                head = f"HTTP/1.1 200 OK\r\nContent-Length: {length}\r\n\r\n".encode('ascii')
+                self.request.sendall(head + buffer[:length])
+                del buffer[:length]
+        except OSError:
+            return
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+    request_queue_size = 1024
+
+class LoopbackServer:
+    def __init__(self, kind='echo', host='127.0.0.1'):
+        """
+        Initialize a stand-in server on an ephemeral port, with one thread per connection.
+
+        :param kind: 'echo' sends every byte straight back; 'http' answers every HTTP request with
+                     its own body (default: 'echo').
+        :param host: The address to bind to (default: '127.0.0.1').
+        """
+        if kind not in ('echo', 'http'):
+            raise ValueError("kind must be 'echo' or 'http'.")
+        handler = _EchoHandler if kind == 'echo' else _HTTPEchoHandler
+        self.kind = kind
+        self.server = _ThreadingServer((host, 0), handler)
+        self.host, self.port = self.server.server_address[:2]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True,
+                                       name=f"LoopbackServer-{kind}")
+
+    def start(self):
+        """
+        Start serving in a background thread.
+
+        :return: The server itself.
+        """
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop serving and close the listening socket.
+        """
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+def _tcp_round_trip(port):
+    client = TCPClient('127.0.0.1', port)
+    client.connect()
+    client.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def round_trip(payload):
+        client.send_data(payload)
+        remaining = len(payload)
+        while remaining:
+            data = client.receive_data(min(remaining, 65536))
+            if not data:
+                raise ConnectionError("The echo server closed the connection.")
+            remaining -= len(data)
+
+    return client, round_trip
+
+def _custom_round_trip(port):
+    client = CustomProtocol('127.0.0.1', port, reuse_buffer=True)
+    client.connect()
+    client.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def round_trip(payload):
+        client.send_bytes(payload)
+        if client.receive_bytes() is None:
+            raise ConnectionError("The echo server closed the connection.")
+
+    return client, round_trip
+
+def _http_round_trip(port):
+    client = SimpleHTTPClient(f"http://127.0.0.1:{port}/echo")
+    client.connect()
+    client.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def round_trip(payload):
+        client.request("POST", body=payload)
+
+    return client, round_trip
+
+# Client name -> (server kind, function connecting a client and returning (client, round_trip)).
+CLIENTS = {
+    'tcp': ('echo', _tcp_round_trip),
+    'custom': ('echo', _custom_round_trip),
+    'http': ('http', _http_round_trip),
+}
+
+def percentile(sorted_values, percent):
+    """
+    Get a percentile of already sorted values, using the nearest-rank method.
+
+    :param sorted_values: The values in ascending order.
+    :param percent: The percentile, from 0 to 100.
+    :return: The value at that percentile, or None if there are no values.
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, int(-(-percent * len(sorted_values) // 100)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def run_benchmark(client_name, port, size, concurrency=1, messages=1000, warmup=10):
+    """
+    Measure one client against a running stand-in server.
+
+    Each of concurrency threads opens its own connection and does its share of the round trips
+    one after the other; throughput is measured from the moment all threads start together.
+
+    :param client_name: 'tcp', 'custom' or 'http'.
+    :param port: The port of a LoopbackServer of the matching kind.
+    :param size: Payload size in bytes.
+    :param concurrency: Number of concurrent connections (default: 1).
+    :param messages: Total number of measured round trips (default: 1000).
+    :param warmup: Unmeasured round trips per connection before the run (default: 10).
+    :return: A dictionary of the parameters, throughput and latency percentiles in microseconds.
+    """
+    connect = CLIENTS[client_name][1]
+    payload = bytes(size)
+    share = max(1, messages // concurrency)
+    latencies = [[] for _ in range(concurrency)]
+    errors = []
+    start = threading.Barrier(concurrency + 1)
+
+    def worker(index):
+        client = None
+        try:
+            client, round_trip = connect(port)
+            for _ in range(warmup):
+                round_trip(payload)
+        except Exception as e:
+            errors.append(e)
+        start.wait()
+        if client is None or errors:
+            return
+        samples = latencies[index]
+        try:
+            for _ in range(share):
+                sent_at = time.perf_counter_ns()
+                round_trip(payload)
+                samples.append(time.perf_counter_ns() - sent_at)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+    if errors:
+        raise RuntimeError(f"{client_name} benchmark failed: {errors[0]}") from errors[0]
+
+    samples = sorted(sample for worker_samples in latencies for sample in worker_samples)
+    result = {
+        'client': client_name,
+        'size': size,
+        'concurrency': concurrency,
+        'messages': len(samples),
+        'seconds': elapsed,
+        'msgs_per_s': len(samples) / elapsed,
+        'mb_per_s': len(samples) * size / elapsed / 1e6,
+    }
+    for percent in PERCENTILES:
+        result[f"p{percent:g}_us".replace('.', '')] = percentile(samples, percent) / 1000
+    return result
+
+def run_suite(clients=('tcp', 'custom', 'http'), sizes=(64, 4096, 65536), concurrency=(1, 8), messages=2000):
+    """
+    Run every combination of client, message size and concurrency level.
+
+    One stand-in server of each needed kind is started for the whole suite.
+
+    :param clients: Client names from CLIENTS (default: all of them).
+    :param sizes: Payload sizes in bytes.
+    :param concurrency: Numbers of concurrent connections.
+    :param messages: Round trips per combination.
+    :return: A list of result dictionaries, see run_benchmark().
+    """
+    unknown = set(clients) - set(CLIENTS)
+    if unknown:
+        raise ValueError(f"Unknown clients: {sorted(unknown)}; choose from {sorted(CLIENTS)}.")
+    servers = {kind: LoopbackServer(kind).start() for kind in {CLIENTS[name][0] for name in clients}}
+    results = []
+    try:
+        for name in clients:
+            port = servers[CLIENTS[name][0]].port
+            for size in sizes:
+                for level in concurrency:
+                    results.append(run_benchmark(name, port, size, level, messages))
+    finally:
+        for server in servers.values():
+            server.stop()
+    return results
+
+def to_json(results):
+    """
+    Serialize suite results together with the environment they were measured in.
+
+    :param results: The list returned by run_suite().
+    :return: A JSON document as a string.
+    """
+    document = {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': sys.version.split()[0],
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    return json.dumps(document, indent=2)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the protocol clients against loopback stand-in servers.")
+    parser.add_argument('--clients', nargs='+', default=list(CLIENTS), choices=list(CLIENTS),
+                        help="Clients to measure.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[64, 4096, 65536], help="Payload sizes in bytes.")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8],
+                        help="Numbers of concurrent connections.")
+    parser.add_argument('--messages', type=int, default=2000, help="Round trips per combination.")
+    parser.add_argument('--json', metavar='PATH', help="Write the results as JSON to PATH, or '-' for stdout.")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.clients, args.sizes, args.concurrency, args.messages)
+    if args.json == '-':
+        print(to_json(results))
+        return
+    for result in results:
+        print(f"{result['client']:<7} {result['size']:>8} B  x{result['concurrency']:<3} "
+              f"{result['msgs_per_s']:>10.1f} msgs/s {result['mb_per_s']:>9.1f} MB/s  "
+              f"p50 {result['p50_us']:>8.1f} us  p99 {result['p99_us']:>8.1f} us  p999 {result['p999_us']:>8.1f} us")
+    if args.json:
+        with open(args.json, 'w') as file:
+            file.write(to_json(results))
+
+if __name__ == "__main__":
+    main()
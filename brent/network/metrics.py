@@ -0,0 +1,167 @@
+import time
+from bisect import bisect_left
+
+# Upper bounds, doubling from 10 microseconds to about 84 seconds.
+LATENCY_BUCKETS = tuple(0.00001 * 2 ** i for i in range(24))
+# Upper bounds, doubling from 1 to about a million queued tasks.
+DEPTH_BUCKETS = tuple(float(2 ** i) for i in range(21))
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """
+        Initialize a histogram with fixed bucket boundaries.
+
+        Observing a value only increments a counter, so recording costs no allocation.
+
+        :param buckets: Sorted upper bounds of the buckets. Larger values fall in an overflow bucket.
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """
+        Record a value.
+
+        :param value: The value to record.
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """
+        Estimate a quantile from the bucket counts.
+
+        :param q: The quantile, between 0 and 1.
+        :return: The upper bound of the bucket holding the quantile, inf for the overflow bucket,
+                 or None if nothing was recorded.
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return self.buckets[index] if index < len(self.buckets) else float('inf')
+        return float('inf')
+
+    def snapshot(self):
+        """
+        Get the state of the histogram.
+
+        :return: A dictionary with the count, the sum and the cumulative count for each bucket bound.
+        """
+        cumulative = []
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            cumulative.append((bound, seen))
+        return {'count': self.count, 'sum': self.sum, 'buckets': cumulative}
+
+class SchedulerMetrics:
+    COUNTERS = ('enqueued', 'started', 'completed', 'failed', 'rejected', 'dropped', 'rate_limited',
+                'expired', 'timed_out')
+
+    def __init__(self, clock=time.monotonic):
+        """
+        Initialize empty scheduler metrics.
+
+        The scheduler records into this object while holding its own lock, so it does no locking itself.
+
+        :param clock: Function returning the current time in seconds (default: time.monotonic).
+        """
+        self.clock = clock
+        self.started_at = clock()
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+        self.wait_time = {}
+        self.run_time = {}
+        self.queue_depth = Histogram(DEPTH_BUCKETS)
+
+    def increment(self, name, amount=1):
+        """
+        Increment a throughput counter.
+
+        :param name: The name of the counter.
+        :param amount: The amount to add (default: 1).
+        """
+        self.counters[name] += amount
+
+    def observe_wait(self, priority, seconds):
+        """
+        Record the time a task waited between becoming due and starting.
+
+        :param priority: The priority the task started with.
+        :param seconds: The wait in seconds.
+        """
+        histogram = self.wait_time.get(priority)
+        if histogram is None:
+            histogram = self.wait_time[priority] = Histogram()
+        histogram.observe(seconds)
+
+    def observe_run(self, priority, seconds):
+        """
+        Record the run time of a task.
+
+        :param priority: The priority the task ran with.
+        :param seconds: The run time in seconds.
+        """
+        histogram = self.run_time.get(priority)
+        if histogram is None:
+            histogram = self.run_time[priority] = Histogram()
+        histogram.observe(seconds)
+
+    def observe_depth(self, depth):
+        """
+        Record the number of tasks waiting in the priority queue.
+
+        :param depth: The queue depth.
+        """
+        self.queue_depth.observe(depth)
+
+    def snapshot(self):
+        """
+        Get a copy of all metrics.
+
+        :return: A dictionary with the uptime in seconds, the counters, the per-priority 'wait_time' and
+                 'run_time' histograms and the 'queue_depth' histogram.
+        """
+        return {
+            'uptime': self.clock() - self.started_at,
+            'counters': dict(self.counters),
+            'wait_time': {priority: histogram.snapshot() for priority, histogram in sorted(self.wait_time.items())},
+            'run_time': {priority: histogram.snapshot() for priority, histogram in sorted(self.run_time.items())},
+            'queue_depth': self.queue_depth.snapshot(),
+        }
+
+    def to_text(self, prefix='brent_scheduler'):
+        """
+        Render the metrics in the Prometheus text exposition format.
+
+        :param prefix: Prefix of every metric name (default: 'brent_scheduler').
+        :return: The exposition as a string.
+        """
+        snapshot = self.snapshot()
+        lines = [f"# TYPE {prefix}_uptime_seconds gauge", f"{prefix}_uptime_seconds {snapshot['uptime']}"]
+        for name, value in snapshot['counters'].items():
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        for name in ('wait_time', 'run_time'):
+            metric = f"{prefix}_{name}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for priority, histogram in snapshot[name].items():
+                _histogram_lines(lines, metric, histogram, f'priority="{priority}",')
+        lines.append(f"# TYPE {prefix}_queue_depth histogram")
+        _histogram_lines(lines, f"{prefix}_queue_depth", snapshot['queue_depth'], '')
+        return "\n".join(lines) + "\n"
+
+def _histogram_lines(lines, metric, histogram, labels):
+    for bound, count in histogram['buckets']:
+        le = "+Inf" if bound == float('inf') else f"{bound:g}"
+        lines.append(f'{metric}_bucket{{{labels}le="{le}"}} {count}')
+    labels = labels.rstrip(',')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{metric}_sum{suffix} {histogram['sum']}")
+    lines.append(f"{metric}_count{suffix} {histogram['count']}")
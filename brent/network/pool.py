@@ -0,0 +1,413 @@
+import asyncio
+import collections
+import contextlib
+import socket
+import threading
+import time
+
+from brent.network.protocols.async_custom_protocol import AsyncCustomProtocol
+from brent.network.protocols.custom_protocol import CustomProtocol
+
+# Errors that mean the peer dropped the connection, so a fresh connection may succeed.
+RECONNECT_ERRORS = (BrokenPipeError, ConnectionResetError, ConnectionAbortedError)
+
+def socket_is_alive(client):
+    """
+    Check that a pooled client's socket is still open and has no unread data.
+
+    :param client: A client with a `socket` attribute.
+    :return: False if the peer closed the connection or sent data nobody asked for, True otherwise.
+    """
+    try:
+        client.socket.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT)
+    except BlockingIOError:
+        return True
+    except OSError:
+        return False
+    # b"" means the peer closed the connection; leftover bytes would be read as the next response.
+    return False
+
+def stream_is_alive(client):
+    """
+    Check that a pooled asyncio client's stream and reader task are still running.
+
+    :param client: A client with `writer` and, optionally, `read_task` attributes.
+    :return: True if the connection can be reused.
+    """
+    if client.writer is None or client.writer.is_closing():
+        return False
+    read_task = getattr(client, 'read_task', None)
+    return read_task is None or not read_task.done()
+
+class _Idle:
+    def __init__(self, client, released_at):
+        self.client = client
+        self.released_at = released_at
+
+class ConnectionPool:
+    def __init__(self, factory=CustomProtocol, max_size=10, idle_timeout=60.0, health_check=socket_is_alive,
+                 clock=time.monotonic):
+        """
+        Initialize a thread-safe pool of connected clients keyed by (host, port).
+
+        Reusing a connection skips the TCP handshake. Checked-out connections are health-checked first,
+        connections left idle for longer than idle_timeout are closed, and call() reconnects once when
+        a pooled connection turns out to be broken.
+
+        :param factory: Client class or function called as factory(host, port); the client must have
+                        connect() and close() (default: CustomProtocol; TCPClient works too).
+        :param max_size: Maximum number of connections per (host, port), idle or checked out (default: 10).
+        :param idle_timeout: Seconds an idle connection is kept, or None to keep it forever (default: 60.0).
+        :param health_check: Function called with an idle client before it is handed out; it returns False
+                             to discard the client (default: socket_is_alive).
+        :param clock: Function returning the current time in seconds (default: time.monotonic).
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1.")
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check = health_check
+        self.clock = clock
+        self.idle = collections.defaultdict(collections.deque)
+        self.sizes = collections.Counter()
+        self.lock = threading.Lock()
+        self.released = threading.Condition(self.lock)
+        self.closed = False
+
+    def acquire(self, host, port, timeout=None):
+        """
+        Check out a connected client, reusing an idle connection if possible.
+
+        :param host: The server's hostname or IP address.
+        :param port: The server's port number.
+        :param timeout: Seconds to wait when max_size connections are checked out, or None to wait forever.
+        :return: A connected client. Give it back with release().
+        """
+        key = (host, port)
+        deadline = None if timeout is None else self.clock() + timeout
+        with self.lock:
+            while True:
+                if self.closed:
+                    raise RuntimeError("The connection pool is closed.")
+                self._evict_expired(key)
+                while self.idle[key]:
+                    # Most recently released first, so the rest age out and get evicted.
+                    client = self.idle[key].pop().client
+                    if self.health_check is None or self.health_check(client):
+                        return client
+                    self._discard(key, client)
+                if self.sizes[key] < self.max_size:
+                    self.sizes[key] += 1
+                    break
+                remaining = None if deadline is None else deadline - self.clock()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"No connection to {host}:{port} became available.")
+                self.released.wait(remaining)
+        # Connect outside the lock so a slow handshake does not block other keys.
+        return self._connect(key)
+
+    def _connect(self, key):
+        client = None
+        try:
+            client = self.factory(*key)
+            client.connect()
+        except BaseException:
+            if client is not None:
+                client.close()
+            with self.lock:
+                self.sizes[key] -= 1
+                self.released.notify()
+            raise
+        return client
+
+    def release(self, client, broken=False):
+        """
+        Give a checked-out client back to the pool.
+
+        :param client: The client returned by acquire().
+        :param broken: Close the client instead of keeping it, e.g. after an error left it mid-response.
+        """
+        key = (client.host, client.port)
+        with self.lock:
+            if broken or self.closed:
+                self._discard(key, client)
+            else:
+                self.idle[key].append(_Idle(client, self.clock()))
+            self.released.notify()
+
+    @contextlib.contextmanager
+    def connection(self, host, port, timeout=None):
+        """
+        Check out a client for the duration of a with block.
+
+        The client is returned to the pool afterwards, or closed if the block raised an exception.
+
+        :param host: The server's hostname or IP address.
+        :param port: The server's port number.
+        :param timeout: See acquire().
+        """
+        client = self.acquire(host, port, timeout)
+        try:
+            yield client
+        except BaseException:
+            self.release(client, broken=True)
+            raise
+        self.release(client)
+
+    def call(self, host, port, function, timeout=None):
+        """
+        Run function(client) on a pooled connection, reconnecting once if the connection was broken.
+
+        Only use it for requests that are safe to send twice: a broken pipe or reset can also happen
+        after the server has received the request.
+
+        :param host: The server's hostname or IP address.
+        :param port: The server's port number.
+        :param function: Function called with the client.
+        :param timeout: See acquire().
+        :return: The function's return value.
+        """
+        try:
+            with self.connection(host, port, timeout) as client:
+                return function(client)
+        except RECONNECT_ERRORS as e:
+            print(f"Connection to {host}:{port} broken ({e}), reconnecting.")
+        with self.connection(host, port, timeout) as client:
+            return function(client)
+
+    def evict_idle(self):
+        """
+        Close every connection that has been idle for longer than idle_timeout.
+
+        Expired connections are also evicted lazily on acquire(); call this periodically (for example as
+        a periodic NetworkTaskScheduler task) to release them when a host is no longer used.
+        """
+        with self.lock:
+            for key in list(self.idle):
+                self._evict_expired(key)
+
+    def _evict_expired(self, key):
+        if self.idle_timeout is None:
+            return
+        idle = self.idle[key]
+        expired_before = self.clock() - self.idle_timeout
+        while idle and idle[0].released_at < expired_before:
+            self._discard(key, idle.popleft().client)
+
+    def _discard(self, key, client):
+        self.sizes[key] -= 1
+        try:
+            client.close()
+        except OSError as e:
+            print(f"Failed to close connection to {key[0]}:{key[1]}: {e}")
+
+    def get_idle_count(self, host, port):
+        """
+        Get the number of idle connections to a server.
+
+        :return: The number of idle connections.
+        """
+        with self.lock:
+            return len(self.idle[(host, port)])
+
+    def get_size(self, host, port):
+        """
+        Get the number of open connections to a server, idle or checked out.
+
+        :return: The number of connections.
+        """
+        with self.lock:
+            return self.sizes[(host, port)]
+
+    def close(self):
+        """
+        Close all idle connections. Connections still checked out are closed when they are released.
+        """
+        with self.lock:
+            self.closed = True
+            for key, idle in self.idle.items():
+                while idle:
+                    self._discard(key, idle.popleft().client)
+            self.released.notify_all()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class AsyncConnectionPool:
+    def __init__(self, factory=AsyncCustomProtocol, max_size=10, idle_timeout=60.0, health_check=stream_is_alive,
+                 clock=time.monotonic):
+        """
+        Initialize an asyncio pool of connected clients keyed by (host, port).
+
+        It behaves like ConnectionPool, with coroutine methods. Use it from a single event loop.
+
+        :param factory: Client class or function called as factory(host, port); the client must have
+                        coroutine connect() and close() methods (default: AsyncCustomProtocol).
+        :param max_size: Maximum number of connections per (host, port), idle or checked out (default: 10).
+        :param idle_timeout: Seconds an idle connection is kept, or None to keep it forever (default: 60.0).
+        :param health_check: Function called with an idle client before it is handed out; it returns False
+                             to discard the client (default: stream_is_alive).
+        :param clock: Function returning the current time in seconds (default: time.monotonic).
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1.")
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check = health_check
+        self.clock = clock
+        self.idle = collections.defaultdict(collections.deque)
+        self.sizes = collections.Counter()
+        self.released = asyncio.Condition()
+        self.closed = False
+
+    async def acquire(self, host, port, timeout=None):
+        """
+        Check out a connected client, reusing an idle connection if possible.
+
+        :param host: The server's hostname or IP address.
+        :param port: The server's port number.
+        :param timeout: Seconds to wait when max_size connections are checked out, or None to wait forever.
+        :return: A connected client. Give it back with release().
+        """
+        key = (host, port)
+        deadline = None if timeout is None else self.clock() + timeout
+        async with self.released:
+            while True:
+                if self.closed:
+                    raise RuntimeError("The connection pool is closed.")
+                await self._evict_expired(key)
+                while self.idle[key]:
+                    client = self.idle[key].pop().client
+                    if self.health_check is None or self.health_check(client):
+                        return client
+                    await self._discard(key, client)
+                if self.sizes[key] < self.max_size:
+                    self.sizes[key] += 1
+                    break
+                remaining = None if deadline is None else deadline - self.clock()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"No connection to {host}:{port} became available.")
+                try:
+                    await asyncio.wait_for(self.released.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        client = None
+        try:
+            client = self.factory(host, port)
+            await client.connect()
+        except BaseException:
+            if client is not None:
+                await client.close()
+            async with self.released:
+                self.sizes[key] -= 1
+                self.released.notify()
+            raise
+        return client
+
+    async def release(self, client, broken=False):
+        """
+        Give a checked-out client back to the pool.
+
+        :param client: The client returned by acquire().
+        :param broken: Close the client instead of keeping it.
+        """
+        key = (client.host, client.port)
+        async with self.released:
+            if broken or self.closed:
+                await self._discard(key, client)
+            else:
+                self.idle[key].append(_Idle(client, self.clock()))
+            self.released.notify()
+
+    @contextlib.asynccontextmanager
+    async def connection(self, host, port, timeout=None):
+        """
+        Check out a client for the duration of an async with block.
+
+        The client is returned to the pool afterwards, or closed if the block raised an exception.
+        """
+        client = await self.acquire(host, port, timeout)
+        try:
+            yield client
+        except BaseException:
+            await self.release(client, broken=True)
+            raise
+        await self.release(client)
+
+    async def call(self, host, port, function, timeout=None):
+        """
+        Await function(client) on a pooled connection, reconnecting once if the connection was broken.
+
+        Only use it for requests that are safe to send twice.
+
+        :param function: Coroutine function called with the client.
+        :return: The function's return value.
+        """
+        try:
+            async with self.connection(host, port, timeout) as client:
+                return await function(client)
+        except RECONNECT_ERRORS as e:
+            print(f"Connection to {host}:{port} broken ({e}), reconnecting.")
+        async with self.connection(host, port, timeout) as client:
+            return await function(client)
+
+    async def evict_idle(self):
+        """
+        Close every connection that has been idle for longer than idle_timeout.
+        """
+        async with self.released:
+            for key in list(self.idle):
+                await self._evict_expired(key)
+
+    async def _evict_expired(self, key):
+        if self.idle_timeout is None:
+            return
+        idle = self.idle[key]
+        expired_before = self.clock() - self.idle_timeout
+        while idle and idle[0].released_at < expired_before:
+            await self._discard(key, idle.popleft().client)
+
+    async def _discard(self, key, client):
+        self.sizes[key] -= 1
+        try:
+            await client.close()
+        except OSError as e:
+            print(f"Failed to close connection to {key[0]}:{key[1]}: {e}")
+
+    def get_idle_count(self, host, port):
+        """
+        Get the number of idle connections to a server.
+
+        :return: The number of idle connections.
+        """
+        return len(self.idle[(host, port)])
+
+    def get_size(self, host, port):
+        """
+        Get the number of open connections to a server, idle or checked out.
+
+        :return: The number of connections.
+        """
+        return self.sizes[(host, port)]
+
+    async def close(self):
+        """
+        Close all idle connections. Connections still checked out are closed when they are released.
+        """
+        async with self.released:
+            self.closed = True
+            for key, idle in self.idle.items():
+                while idle:
+                    await self._discard(key, idle.popleft().client)
+            self.released.notify_all()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
@@ -0,0 +1,132 @@
+from operator import attrgetter
+
+class IndexedPriorityQueue:
+    def __init__(self, key=attrgetter('task_id')):
+        """
+        Initialize an empty binary min-heap that tracks the position of every item by key.
+
+        Items are ordered with `<`. The position index makes removal and re-prioritization of an
+        arbitrary item O(log n) instead of a linear search.
+
+        :param key: Function returning the unique key of an item (default: the item's task_id).
+        """
+        self.key = key
+        self.heap = []
+        self.positions = {}
+
+    def push(self, item):
+        """
+        Add an item to the queue.
+
+        :param item: The item to add. Its key must not already be in the queue.
+        """
+        key = self.key(item)
+        if key in self.positions:
+            raise ValueError(f"An item with key '{key}' is already queued.")
+        self.heap.append(item)
+        self.positions[key] = len(self.heap) - 1
+        self._sift_up(len(self.heap) - 1)
+
+    def pop(self):
+        """
+        Remove and return the smallest item.
+
+        :return: The smallest item.
+        """
+        if not self.heap:
+            raise IndexError("pop from an empty priority queue")
+        return self._remove_at(0)
+
+    def peek(self):
+        """
+        Return the smallest item without removing it.
+
+        :return: The smallest item.
+        """
+        if not self.heap:
+            raise IndexError("peek at an empty priority queue")
+        return self.heap[0]
+
+    def get(self, key, default=None):
+        """
+        Get the queued item with the given key.
+
+        :param key: The key of the item.
+        :param default: The value to return if no item has the key.
+        :return: The item or the default value.
+        """
+        position = self.positions.get(key)
+        return default if position is None else self.heap[position]
+
+    def remove(self, key):
+        """
+        Remove the item with the given key.
+
+        :param key: The key of the item.
+        :return: The removed item.
+        """
+        return self._remove_at(self.positions[key])
+
+    def update(self, key):
+        """
+        Restore the heap order after the ordering of the item with the given key has changed.
+
+        :param key: The key of the item.
+        """
+        position = self.positions[key]
+        self._sift_down(self._sift_up(position))
+
+    def _remove_at(self, position):
+        item = self.heap[position]
+        del self.positions[self.key(item)]
+        last = self.heap.pop()
+        if position < len(self.heap):
+            self.heap[position] = last
+            self.positions[self.key(last)] = position
+            self._sift_down(self._sift_up(position))
+        return item
+
+    def _sift_up(self, position):
+        heap = self.heap
+        item = heap[position]
+        while position > 0:
+            parent = (position - 1) >> 1
+            if not item < heap[parent]:
+                break
+            heap[position] = heap[parent]
+            self.positions[self.key(heap[position])] = position
+            position = parent
+        heap[position] = item
+        self.positions[self.key(item)] = position
+        return position
+
+    def _sift_down(self, position):
+        heap = self.heap
+        size = len(heap)
+        item = heap[position]
+        while True:
+            child = 2 * position + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child + 1] < heap[child]:
+                child += 1
+            if not heap[child] < item:
+                break
+            heap[position] = heap[child]
+            self.positions[self.key(heap[position])] = position
+            position = child
+        heap[position] = item
+        self.positions[self.key(item)] = position
+        return position
+
+    def __contains__(self, key):
+        return key in self.positions
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __bool__(self):
+        return bool(self.heap)
+
+    def __iter__(self):
+        return iter(self.heap)
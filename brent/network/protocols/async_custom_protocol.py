@@ -0,0 +1,116 @@
+import asyncio
+import collections
+import struct
+
+from brent.network.protocols.custom_protocol import CustomProtocol
+
+class AsyncCustomProtocol:
+    HEADER_FORMAT = CustomProtocol.HEADER_FORMAT
+    HEADER_SIZE = CustomProtocol.HEADER_SIZE
+
+    def __init__(self, host, port):
+        """
+        Initialize an asyncio client for the length-prefixed protocol of CustomProtocol.
+
+        The client pipelines requests: send_message() writes a frame without waiting for the previous
+        response, and a reader task resolves the pending responses in the order the requests were sent.
+
+        :param host: The server's hostname or IP address.
+        :param port: The server's port number.
+        """
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+        self.pending = collections.deque()
+        self.read_task = None
+
+    async def connect(self):
+        """
+        Connect to the server and start reading responses.
+        """
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.read_task = asyncio.get_running_loop().create_task(self._read_responses())
+
+    def send_message(self, message):
+        """
+        Send a message to the server without waiting for its response.
+
+        The frame is buffered by the transport; await drain() after a batch of messages to respect
+        flow control.
+
+        :param message: The message to be sent as a string.
+        :return: An asyncio future resolved with the response as a string.
+        """
+        if self.writer is None or self.read_task.done():
+            raise ConnectionError("The client is not connected.")
+        encoded_message = message.encode('utf-8')
+        self.writer.write(struct.pack(self.HEADER_FORMAT, len(encoded_message)) + encoded_message)
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append(future)
+        return future
+
+    async def drain(self):
+        """
+        Wait until the transport's write buffer is below its high-water mark.
+        """
+        await self.writer.drain()
+
+    async def request(self, message):
+        """
+        Send a message and wait for its response.
+
+        :param message: The message to be sent as a string.
+        :return: The response as a string.
+        """
+        future = self.send_message(message)
+        await self.writer.drain()
+        return await future
+
+    async def _read_responses(self):
+        error = ConnectionError("The server closed the connection.")
+        try:
+            while True:
+                header = await self.reader.readexactly(self.HEADER_SIZE)
+                message_length = struct.unpack(self.HEADER_FORMAT, header)[0]
+                message = await self.reader.readexactly(message_length)
+                if not self.pending:
+                    print(f"Unexpected message from {self.host}:{self.port} dropped.")
+                    continue
+                future = self.pending.popleft()
+                if not future.cancelled():
+                    future.set_result(message.decode('utf-8'))
+        except asyncio.IncompleteReadError:
+            pass
+        except (OSError, UnicodeDecodeError) as e:
+            error = e
+        finally:
+            while self.pending:
+                future = self.pending.popleft()
+                if not future.done():
+                    future.set_exception(error)
+
+    async def close(self):
+        """
+        Close the connection to the server. Responses that have not arrived fail with ConnectionError.
+        """
+        if self.writer is None:
+            return
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except OSError:
+            pass
+        self.read_task.cancel()
+        try:
+            await self.read_task
+        except asyncio.CancelledError:
+            pass
+        self.writer = None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
@@ -1,20 +1,175 @@
+import collections
+import itertools
+import lzma
+import multiprocessing
+import selectors
 import socket
 import struct
+import threading
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+
+def _send_frame(sock, header, payload):
+    # Header and payload go out in one scatter-gather call without being concatenated.
+    if not hasattr(sock, 'sendmsg'):
+        # Platforms without sendmsg() (Windows) get two sends instead of one.
+        sock.sendall(header)
+        sock.sendall(payload)
+        return
+    payload = memoryview(payload).cast('B')
+    total = len(header) + len(payload)
+    sent = sock.sendmsg([header, payload])
+    while sent < total:
+        # A partial send: continue from wherever it stopped, still without copying.
+        if sent < len(header):
+            sent += sock.sendmsg([header[sent:], payload])
+        else:
+            sent += sock.send(payload[sent - len(header):])
+
+class FrameCodec:
+    FLAG_RAW = 0
+    FLAG_ZLIB = 1
+    FLAG_LZMA = 2
+    COMPRESSIONS = (None, 'none', 'zlib', 'lzma')
+
+    def __init__(self, compression=None, threshold=1024, level=None, multiplexed=False):
+        """
+        Initialize the framing state of one CustomProtocol connection.
+
+        With compression None, frames use the classic HEADER_FORMAT. Any other value switches to
+        EXTENDED_HEADER_FORMAT, whose flags byte says how the payload is compressed. Both peers must
+        use the same header, but each side decodes every flag whatever its own compression setting.
+        zlib frames share one streaming compressor per connection, flushed with Z_SYNC_FLUSH after
+        every frame, so later frames reuse the dictionary built by earlier ones. lzma has no sync
+        flush, so lzma frames are compressed independently.
+
+        :param compression: None, 'none' (extended header, never compress), 'zlib' or 'lzma' (default: None).
+        :param threshold: Payloads shorter than this many bytes are sent raw (default: 1024).
+        :param level: zlib level or lzma preset, or None for the library default (default: None).
+        :param multiplexed: Use MULTIPLEXED_HEADER_FORMAT, which adds a stream id after the flags byte
+                            (default: False). Compression None then behaves like 'none'.
+        """
+        if compression not in self.COMPRESSIONS:
+            raise ValueError(f"compression must be one of {self.COMPRESSIONS}.")
+        self.compression = compression
+        self.threshold = threshold
+        self.level = level
+        self.multiplexed = multiplexed
+        if multiplexed:
+            self.header = struct.Struct(CustomProtocol.MULTIPLEXED_HEADER_FORMAT)
+        elif compression is None:
+            self.header = struct.Struct(CustomProtocol.HEADER_FORMAT)
+        else:
+            self.header = struct.Struct(CustomProtocol.EXTENDED_HEADER_FORMAT)
+        self.header_size = self.header.size
+        self.compressor = None
+        if compression == 'zlib':
+            self.compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION if level is None else level)
+        self.decompressor = None
+
+    def encode(self, payload, stream_id=0):
+        """
+        Frame a payload, compressing it if it is large enough.
+
+        :param payload: A bytes-like object.
+        :param stream_id: The stream the frame belongs to; only sent with the multiplexed header (default: 0).
+        :return: A tuple of (header, payload to send). The payload is the original object when it is sent raw.
+        """
+        flags = self.FLAG_RAW
+        if self.compressor is not None and len(payload) >= self.threshold:
+            payload = self.compressor.compress(payload) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+            flags = self.FLAG_ZLIB
+        elif self.compression == 'lzma' and len(payload) >= self.threshold:
+            payload = lzma.compress(payload, preset=self.level)
+            flags = self.FLAG_LZMA
+        if self.multiplexed:
+            return self.header.pack(len(payload), flags, stream_id), payload
+        if self.compression is None:
+            return self.header.pack(len(payload)), payload
+        return self.header.pack(len(payload), flags), payload
+
+    def unpack_from(self, buffer, offset=0):
+        """
+        Parse a frame header.
+
+        :param buffer: A buffer holding at least header_size bytes from offset.
+        :param offset: Position of the header in the buffer (default: 0).
+        :return: A tuple of (payload length on the wire, flags, stream id). The stream id is None
+                 without the multiplexed header.
+        """
+        if self.multiplexed:
+            return self.header.unpack_from(buffer, offset)
+        if self.compression is None:
+            return self.header.unpack_from(buffer, offset)[0], self.FLAG_RAW, None
+        return self.header.unpack_from(buffer, offset) + (None,)
+
+    def decode(self, flags, payload, max_size=None):
+        """
+        Restore a payload received with the given flags.
+
+        :param flags: The flags from the frame header.
+        :param payload: The payload as received.
+        :param max_size: Maximum decompressed size in bytes, or None for no limit (default: None).
+        :return: The payload; the original object for raw frames.
+        """
+        if flags == self.FLAG_RAW:
+            return payload
+        if flags == self.FLAG_ZLIB:
+            if self.decompressor is None:
+                self.decompressor = zlib.decompressobj()
+            data = self.decompressor.decompress(payload, max_size or 0)
+            if self.decompressor.unconsumed_tail:
+                raise ValueError(f"Decompressed frame exceeds {max_size} bytes.")
+            return data
+        if flags == self.FLAG_LZMA:
+            decompressor = lzma.LZMADecompressor()
+            data = decompressor.decompress(payload, -1 if max_size is None else max_size)
+            if not decompressor.eof:
+                raise ValueError(f"Decompressed frame exceeds {max_size} bytes or is truncated.")
+            return data
+        raise ValueError(f"Unknown frame flags: {flags}")
 
 class CustomProtocol:
     HEADER_FORMAT = '!I'  # Example header format: 4-byte unsigned int
     HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+    HEADER = struct.Struct(HEADER_FORMAT)
+    # Payload length and a flags byte; used when compression is enabled (see FrameCodec).
+    EXTENDED_HEADER_FORMAT = '!IB'
+    # Payload length, flags and a stream id; used by MultiplexedCustomProtocol.
+    MULTIPLEXED_HEADER_FORMAT = '!IBI'
+    RECV_SIZE = 65536
 
-    def __init__(self, host, port):
+    def __init__(self, host, port, reuse_buffer=False, buffer_size=65536, compression=None,
+                 compression_threshold=1024, compression_level=None):
         """
         Initialize the CustomProtocol with the server's host and port.
 
+        Frames are sent header and payload together with one scatter-gather sendmsg() call and
+        received with recv_into(), so the payload is never concatenated or copied between buffers.
+
         :param host: The server's hostname or IP address.
         :param port: The server's port number.
+        :param reuse_buffer: Receive every frame into one preallocated buffer that grows to the largest
+                             frame seen, instead of allocating a buffer per frame (default: False).
+                             receive_bytes() then returns a view that is only valid until the next receive.
+        :param buffer_size: Initial size in bytes of the reused receive buffer (default: 65536).
+        :param compression: None for the classic framing, or 'none', 'zlib' or 'lzma' for the extended
+                            header with per-frame compression; the server must use the extended header
+                            too (default: None). See FrameCodec.
+        :param compression_threshold: Payloads shorter than this many bytes are sent raw (default: 1024).
+        :param compression_level: zlib level or lzma preset, or None for the default (default: None).
         """
         self.host = host
         self.port = port
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.reuse_buffer = reuse_buffer
+        self.codec = FrameCodec(compression, compression_threshold, compression_level)
+        self.header_buffer = memoryview(bytearray(self.codec.header_size))
+        self.receive_buffer = memoryview(bytearray(buffer_size)) if reuse_buffer else None
+        # Bytes read by receive_messages() beyond the last complete frame.
+        self.inbound = bytearray()
 
     def connect(self):
         """
@@ -28,22 +183,120 @@ class CustomProtocol:
 
         :param message: The message to be sent as a string.
         """
-        encoded_message = message.encode('utf-8')
-        header = struct.pack(self.HEADER_FORMAT, len(encoded_message))
-        self.socket.sendall(header + encoded_message)
+        self.send_bytes(message.encode('utf-8'))
+
+    def send_bytes(self, payload):
+        """
+        Send a raw payload to the server without any encoding.
+
+        :param payload: A bytes-like object; it is sent without being copied.
+        """
+        header, payload = self.codec.encode(memoryview(payload).cast('B'))
+        _send_frame(self.socket, header, payload)
+
+    def send_messages(self, messages, flush_size=65536, flush_interval=None):
+        """
+        Send many messages, coalescing their frames into as few writes as possible.
+
+        Frames are collected in one buffer that is written out once it holds flush_size bytes, once
+        flush_interval seconds have passed since its first frame, and at the end of the iterable.
+
+        :param messages: Iterable of strings, or of bytes-like objects sent without encoding.
+        :param flush_size: Number of buffered bytes that triggers a write (default: 65536).
+        :param flush_interval: Maximum seconds a frame waits in the buffer, or None for no bound
+                               (default: None). It is checked as messages are taken from the iterable,
+                               so a slow generator should yield promptly for the bound to hold.
+        :return: The number of messages sent.
+        """
+        batch = bytearray()
+        first_buffered_at = None
+        count = 0
+        for message in messages:
+            header, payload = self.codec.encode(message.encode('utf-8') if isinstance(message, str) else message)
+            batch += header
+            batch += payload
+            count += 1
+            if flush_interval is not None and first_buffered_at is None:
+                first_buffered_at = time.monotonic()
+            if len(batch) >= flush_size or (first_buffered_at is not None
+                                            and time.monotonic() - first_buffered_at >= flush_interval):
+                self.socket.sendall(batch)
+                batch.clear()
+                first_buffered_at = None
+        if batch:
+            self.socket.sendall(batch)
+        return count
+
+    def receive_messages(self, raw=False):
+        """
+        Receive every complete message that has arrived, decoding all frames of a single recv.
+
+        Blocks only until at least one complete message is available. A partial frame at the end is
+        kept for the next receive.
+
+        :param raw: Return the payloads as bytes instead of strings (default: False).
+        :return: A list of messages, or None if the connection was closed.
+        """
+        while True:
+            messages = self._decode_inbound(raw)
+            if messages:
+                return messages
+            data = self.socket.recv(self.RECV_SIZE)
+            if not data:
+                return None
+            self.inbound += data
+
+    def _decode_inbound(self, raw):
+        buffer = self.inbound
+        codec = self.codec
+        messages = []
+        offset = 0
+        with memoryview(buffer) as view:
+            while len(buffer) - offset >= codec.header_size:
+                message_length, flags, _ = codec.unpack_from(buffer, offset)
+                start = offset + codec.header_size
+                end = start + message_length
+                if len(buffer) < end:
+                    break
+                # Temporary slices only, so no export of the buffer outlives the loop.
+                payload = codec.decode(flags, bytes(view[start:end]))
+                messages.append(payload if raw else str(payload, 'utf-8'))
+                offset = end
+        # Compact once for the whole batch rather than once per frame.
+        del buffer[:offset]
+        return messages
 
     def receive_message(self):
         """
         Receive a message from the server using the custom protocol.
 
-        :return: The received message as a string.
+        :return: The received message as a string, or None if the connection was closed.
         """
-        header = self._recv_n_bytes(self.HEADER_SIZE)
-        if not header:
+        payload = self.receive_bytes()
+        if payload is None:
             return None
-        message_length = struct.unpack(self.HEADER_FORMAT, header)[0]
-        message = self._recv_n_bytes(message_length)
-        return message.decode('utf-8')
+        return str(payload, 'utf-8')
+
+    def receive_bytes(self):
+        """
+        Receive a raw payload from the server without any decoding.
+
+        :return: A bytearray with the payload, or with reuse_buffer a memoryview of the receive buffer
+                 that is overwritten by the next receive; bytes for a compressed frame. None if the
+                 connection was closed.
+        """
+        if not self._recv_into(self.header_buffer):
+            return None
+        message_length, flags, _ = self.codec.unpack_from(self.header_buffer)
+        if self.reuse_buffer:
+            if message_length > len(self.receive_buffer):
+                self.receive_buffer = memoryview(bytearray(max(message_length, 2 * len(self.receive_buffer))))
+            payload = self.receive_buffer[:message_length]
+        else:
+            payload = bytearray(message_length)
+        if not self._recv_into(memoryview(payload)):
+            return None
+        return self.codec.decode(flags, payload)
 
     def close(self):
         """
@@ -51,17 +304,464 @@ class CustomProtocol:
         """
         self.socket.close()
 
-    def _recv_n_bytes(self, n):
+    def _recv_into(self, view):
         """
-        Receive exactly n bytes from the socket.
+        Fill a buffer from the socket.
 
-        :param n: Number of bytes to receive.
-        :return: The received bytes.
+        :param view: A writable memoryview; exactly len(view) bytes are received into it.
+        :return: True once the view is full, False if the connection was closed first.
         """
-        data = bytearray()
-        while len(data) < n:
-            packet = self.socket.recv(n - len(data))
-            if not packet:
-                return None
-            data.extend(packet)
-        return bytes(data)
+        received = 0
+        if self.inbound:
+            # Left over from receive_messages().
+            received = min(len(view), len(self.inbound))
+            view[:received] = self.inbound[:received]
+            del self.inbound[:received]
+        while received < len(view):
+            count = self.socket.recv_into(view[received:])
+            if not count:
+                return False
+            received += count
+        return True
+
+class MultiplexedCustomProtocol:
+    RECV_SIZE = 65536
+
+    def __init__(self, host, port, compression=None, compression_threshold=1024, compression_level=None):
+        """
+        Initialize a client that shares one connection between many concurrent requests.
+
+        Every request gets a stream id in MULTIPLEXED_HEADER_FORMAT and the server echoes it in the
+        response, so responses can arrive in any order. A reader thread hands each one to the future of
+        its request, and a slow request does not hold up the others. The server must be a
+        CustomProtocolServer with multiplexed=True.
+
+        :param host: The server's hostname or IP address.
+        :param port: The server's port number.
+        :param compression: None/'none', 'zlib' or 'lzma'; see FrameCodec (default: None).
+        :param compression_threshold: Payloads shorter than this many bytes are sent raw (default: 1024).
+        :param compression_level: zlib level or lzma preset, or None for the default (default: None).
+        """
+        self.host = host
+        self.port = port
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.codec = FrameCodec(compression, compression_threshold, compression_level, multiplexed=True)
+        # Held while a frame is encoded and written, so frames and the compression stream stay in order.
+        self.send_lock = threading.Lock()
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.stream_ids = itertools.count(1)
+        self.error = None
+        self.reader = None
+
+    def connect(self):
+        """
+        Connect to the server and start the reader thread.
+        """
+        self.socket.connect((self.host, self.port))
+        self.reader = threading.Thread(target=self._read_responses, daemon=True,
+                                       name=f"MultiplexedCustomProtocol-{self.host}:{self.port}")
+        self.reader.start()
+
+    def submit(self, message):
+        """
+        Send a message without waiting for its response. Safe to call from any thread.
+
+        From a coroutine, await asyncio.wrap_future(client.submit(message)).
+
+        :param message: The message as a string, or a bytes-like object sent without encoding.
+        :return: A concurrent.futures.Future resolved with the response as a string.
+        """
+        payload = message.encode('utf-8') if isinstance(message, str) else message
+        future = Future()
+        with self.lock:
+            if self.error is not None:
+                raise ConnectionError("The connection is closed.") from self.error
+            # Stream ids are 32 bits on the wire; wrap around and skip ids still in use.
+            stream_id = next(self.stream_ids) % 2 ** 32
+            while stream_id == 0 or stream_id in self.pending:
+                stream_id = next(self.stream_ids) % 2 ** 32
+            self.pending[stream_id] = future
+        try:
+            with self.send_lock:
+                header, payload = self.codec.encode(payload, stream_id)
+                _send_frame(self.socket, header, payload)
+        except OSError as e:
+            with self.lock:
+                self.pending.pop(stream_id, None)
+            raise ConnectionError(f"Failed to send to {self.host}:{self.port}.") from e
+        return future
+
+    def request(self, message, timeout=None):
+        """
+        Send a message and wait for its response.
+
+        :param message: The message to be sent as a string.
+        :param timeout: Seconds to wait for the response, or None to wait forever.
+        :return: The response as a string.
+        """
+        return self.submit(message).result(timeout)
+
+    def get_pending_count(self):
+        """
+        Get the number of requests waiting for a response.
+
+        :return: The number of pending requests.
+        """
+        with self.lock:
+            return len(self.pending)
+
+    def _read_responses(self):
+        inbound = bytearray()
+        codec = self.codec
+        error = ConnectionError("The server closed the connection.")
+        try:
+            while True:
+                data = self.socket.recv(self.RECV_SIZE)
+                if not data:
+                    break
+                inbound += data
+                offset = 0
+                while len(inbound) - offset >= codec.header_size:
+                    message_length, flags, stream_id = codec.unpack_from(inbound, offset)
+                    start = offset + codec.header_size
+                    end = start + message_length
+                    if len(inbound) < end:
+                        break
+                    payload = codec.decode(flags, bytes(inbound[start:end]))
+                    offset = end
+                    with self.lock:
+                        future = self.pending.pop(stream_id, None)
+                    if future is None:
+                        print(f"Response for unknown stream {stream_id} from {self.host}:{self.port} dropped.")
+                    elif not future.cancelled():
+                        future.set_result(str(payload, 'utf-8'))
+                del inbound[:offset]
+        except (OSError, ValueError, zlib.error, lzma.LZMAError) as e:
+            error = e
+        with self.lock:
+            self.error = error
+            pending, self.pending = self.pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError(f"Connection to {self.host}:{self.port} lost: {error}"))
+
+    def close(self):
+        """
+        Close the connection. Requests still waiting for a response fail with ConnectionError.
+        """
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.socket.close()
+        if self.reader is not None:
+            self.reader.join()
+
+class _Connection:
+    def __init__(self, sock, address, codec):
+        self.socket = sock
+        self.address = address
+        self.codec = codec
+        self.inbound = bytearray()
+        self.outbound = bytearray()
+        self.writing = False
+
+class CustomProtocolServer:
+    HEADER_FORMAT = CustomProtocol.HEADER_FORMAT
+    HEADER_SIZE = CustomProtocol.HEADER_SIZE
+
+    def __init__(self, host, port, handler, backlog=1024, reuse_port=False, max_message_size=16 * 1024 * 1024,
+                 recv_size=65536, compression=None, compression_threshold=1024, compression_level=None,
+                 multiplexed=False, handler_threads=None):
+        """
+        Initialize a server for the CustomProtocol framing.
+
+        Every process runs a single thread that multiplexes all of its connections with `selectors`
+        (epoll on Linux). Frames are decoded incrementally from a per-connection buffer, so one recv
+        can complete any number of messages, and responses are written without blocking.
+
+        :param host: The address to listen on.
+        :param port: The port to listen on, or 0 to pick a free one (see the `port` attribute after listen()).
+        :param handler: Function called with each received message as a string. If it returns a string,
+                        that string is sent back as the response; if it returns None, nothing is sent.
+        :param backlog: Size of the accept queue (default: 1024).
+        :param reuse_port: Set SO_REUSEPORT so several processes can accept on the same port (default: False).
+        :param max_message_size: Connections announcing a larger message are closed (default: 16 MiB).
+        :param recv_size: Maximum number of bytes read from a connection per recv (default: 65536).
+        :param compression: Framing and compression of responses, as for CustomProtocol (default: None).
+                            Every connection gets its own compression context.
+        :param compression_threshold: Responses shorter than this many bytes are sent raw (default: 1024).
+        :param compression_level: zlib level or lzma preset, or None for the default (default: None).
+        :param multiplexed: Use MULTIPLEXED_HEADER_FORMAT and answer every request with its stream id,
+                            for MultiplexedCustomProtocol clients (default: False).
+        :param handler_threads: Run the handler on a pool of this many threads instead of the event loop
+                                thread, so a slow request does not delay the others; responses are sent
+                                as they complete. Requires multiplexed=True (default: None).
+        """
+        if reuse_port and not hasattr(socket, 'SO_REUSEPORT'):
+            raise ValueError("SO_REUSEPORT is not supported on this platform.")
+        if compression not in FrameCodec.COMPRESSIONS:
+            raise ValueError(f"compression must be one of {FrameCodec.COMPRESSIONS}.")
+        if handler_threads is not None and not multiplexed:
+            raise ValueError("handler_threads requires multiplexed=True, since responses may complete out of order.")
+        self.host = host
+        self.port = port
+        self.handler = handler
+        self.backlog = backlog
+        self.reuse_port = reuse_port
+        self.max_message_size = max_message_size
+        self.recv_size = recv_size
+        self.compression = compression
+        self.compression_threshold = compression_threshold
+        self.compression_level = compression_level
+        self.multiplexed = multiplexed
+        self.handler_threads = handler_threads
+        self.handler_pool = None
+        # Handler calls finished on the pool, waiting for the event loop thread to send their responses.
+        self.completed = collections.deque()
+        self.socket = None
+        self.selector = None
+        self.connections = {}
+        self.running = False
+        self.wakeup_reader, self.wakeup_writer = socket.socketpair()
+        self.wakeup_reader.setblocking(False)
+
+    def listen(self):
+        """
+        Bind the listening socket. Called by serve_forever() if needed; call it first to learn the port.
+        """
+        if self.socket is None:
+            self.socket = self._listening_socket()
+            self.port = self.socket.getsockname()[1]
+
+    def _listening_socket(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(self.backlog)
+        sock.setblocking(False)
+        return sock
+
+    def serve_forever(self, processes=1):
+        """
+        Accept connections and handle messages until shutdown() is called.
+
+        :param processes: Number of processes accepting on the port (default: 1). More than one requires
+                          reuse_port=True; the extra processes are started with multiprocessing, so the
+                          handler must be picklable under the platform's start method.
+        """
+        if processes > 1 and not self.reuse_port:
+            raise ValueError("Serving from several processes requires reuse_port=True.")
+        self.listen()
+        options = {'backlog': self.backlog, 'max_message_size': self.max_message_size, 'recv_size': self.recv_size,
+                   'compression': self.compression, 'compression_threshold': self.compression_threshold,
+                   'compression_level': self.compression_level, 'multiplexed': self.multiplexed,
+                   'handler_threads': self.handler_threads}
+        children = [multiprocessing.Process(target=_serve_child, daemon=True,
+                                            args=(self.host, self.port, self.handler, options))
+                    for _ in range(processes - 1)]
+        for child in children:
+            child.start()
+        try:
+            self._serve()
+        finally:
+            for child in children:
+                child.terminate()
+                child.join()
+
+    def _serve(self):
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.socket, selectors.EVENT_READ)
+        self.selector.register(self.wakeup_reader, selectors.EVENT_READ)
+        if self.handler_threads is not None:
+            self.handler_pool = ThreadPoolExecutor(self.handler_threads, thread_name_prefix="CustomProtocolServer-handler")
+        self.running = True
+        try:
+            while self.running:
+                for key, events in self.selector.select():
+                    if key.fileobj is self.socket:
+                        self._accept()
+                    elif key.fileobj is self.wakeup_reader:
+                        self._drain_wakeup()
+                        self._send_completed()
+                    else:
+                        connection = key.data
+                        if events & selectors.EVENT_READ:
+                            self._read(connection)
+                        if events & selectors.EVENT_WRITE and connection.socket.fileno() != -1:
+                            self._write(connection)
+        finally:
+            if self.handler_pool is not None:
+                self.handler_pool.shutdown(wait=True, cancel_futures=True)
+                self.handler_pool = None
+            self.completed.clear()
+            for connection in list(self.connections.values()):
+                self._close_connection(connection)
+            self.selector.close()
+            self.selector = None
+
+    def _drain_wakeup(self):
+        try:
+            while self.wakeup_reader.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _accept(self):
+        while True:
+            try:
+                sock, address = self.socket.accept()
+            except BlockingIOError:
+                return
+            except OSError as e:
+                # e.g. EMFILE when the descriptor limit is reached; the pending connection stays queued.
+                print(f"Failed to accept a connection: {e}")
+                return
+            sock.setblocking(False)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            codec = FrameCodec(self.compression, self.compression_threshold, self.compression_level, self.multiplexed)
+            connection = _Connection(sock, address, codec)
+            self.connections[sock.fileno()] = connection
+            self.selector.register(sock, selectors.EVENT_READ, connection)
+
+    def _read(self, connection):
+        try:
+            data = connection.socket.recv(self.recv_size)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._close_connection(connection)
+            return
+        buffer = connection.inbound
+        buffer += data
+        codec = connection.codec
+        offset = 0
+        while len(buffer) - offset >= codec.header_size:
+            message_length, flags, stream_id = codec.unpack_from(buffer, offset)
+            if message_length > self.max_message_size:
+                print(f"Closing {connection.address}: message of {message_length} bytes exceeds the limit.")
+                self._close_connection(connection)
+                return
+            end = offset + codec.header_size + message_length
+            if len(buffer) < end:
+                break
+            message = buffer[offset + codec.header_size:end]
+            offset = end
+            try:
+                message = codec.decode(flags, message, self.max_message_size)
+            except (ValueError, zlib.error, lzma.LZMAError) as e:
+                print(f"Closing {connection.address}: invalid frame: {e}")
+                self._close_connection(connection)
+                return
+            if self.handler_pool is not None:
+                try:
+                    text = message.decode('utf-8')
+                except UnicodeDecodeError as e:
+                    print(f"Closing {connection.address}: invalid frame: {e}")
+                    self._close_connection(connection)
+                    return
+                future = self.handler_pool.submit(self.handler, text)
+                future.add_done_callback(partial(self._handler_done, connection, stream_id))
+                continue
+            try:
+                response = self.handler(message.decode('utf-8'))
+            except Exception as e:
+                print(f"Handler failed for {connection.address}: {e}")
+                self._close_connection(connection)
+                return
+            self._queue_response(connection, stream_id, response)
+        # Compact once per recv rather than once per message.
+        del buffer[:offset]
+        if connection.outbound and not connection.writing:
+            self._write(connection)
+
+    def _queue_response(self, connection, stream_id, response):
+        if response is not None:
+            header, encoded_response = connection.codec.encode(response.encode('utf-8'), stream_id or 0)
+            connection.outbound += header
+            connection.outbound += encoded_response
+
+    def _handler_done(self, connection, stream_id, future):
+        # Runs on a pool thread; the event loop thread owns the connections, so hand the result over.
+        self.completed.append((connection, stream_id, future))
+        try:
+            self.wakeup_writer.send(b"\0")
+        except OSError:
+            pass
+
+    def _send_completed(self):
+        while self.completed:
+            connection, stream_id, future = self.completed.popleft()
+            if self.connections.get(connection.socket.fileno()) is not connection:
+                # The connection was closed while the handler ran.
+                continue
+            if future.cancelled():
+                continue
+            error = future.exception()
+            if error is not None:
+                print(f"Handler failed for {connection.address}: {error}")
+                self._close_connection(connection)
+                continue
+            self._queue_response(connection, stream_id, future.result())
+            if connection.outbound and not connection.writing:
+                self._write(connection)
+
+    def _write(self, connection):
+        try:
+            sent = connection.socket.send(connection.outbound)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self._close_connection(connection)
+            return
+        del connection.outbound[:sent]
+        writing = bool(connection.outbound)
+        if writing != connection.writing:
+            # Only watch for writability while a response is waiting for space in the socket buffer.
+            events = selectors.EVENT_READ | selectors.EVENT_WRITE if writing else selectors.EVENT_READ
+            self.selector.modify(connection.socket, events, connection)
+            connection.writing = writing
+
+    def _close_connection(self, connection):
+        if self.connections.pop(connection.socket.fileno(), None) is None:
+            return
+        self.selector.unregister(connection.socket)
+        connection.socket.close()
+
+    def shutdown(self):
+        """
+        Stop serve_forever(). Safe to call from another thread.
+        """
+        self.running = False
+        try:
+            self.wakeup_writer.send(b"\0")
+        except OSError:
+            pass
+
+    def close(self):
+        """
+        Close the listening socket.
+        """
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+        self.wakeup_reader.close()
+        self.wakeup_writer.close()
+
+    def get_connection_count(self):
+        """
+        Get the number of open connections in this process.
+
+        :return: The number of connections.
+        """
+        return len(self.connections)
+
+def _serve_child(host, port, handler, options):
+    # The kernel balances new connections across every socket bound to the port with SO_REUSEPORT.
+    server = CustomProtocolServer(host, port, handler, reuse_port=True, **options)
+    server.serve_forever()
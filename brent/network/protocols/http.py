@@ -1,11 +1,83 @@
+import collections
+import os
 import socket
 from urllib.parse import urlparse
 
+class HTTPResponseError(Exception):
+    """
+    Raised when a server's response cannot be parsed.
+    """
+    pass
+
+class HTTPResponse:
+    def __init__(self, version, status, reason, headers, head):
+        """
+        Initialize an HTTP response.
+
+        :param version: The HTTP version from the status line, e.g. 'HTTP/1.1'.
+        :param status: The status code as an integer.
+        :param reason: The reason phrase.
+        :param headers: Dictionary of headers with lower-case names; repeated headers are joined with ', '.
+        :param head: The raw status line and headers as bytes.
+        """
+        self.version = version
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.head = head
+        self.body = None
+        self.method = None
+        self.will_close = False
+        self.chunks = None
+
+    def iter_chunks(self):
+        """
+        Iterate over the body as raw bytes in the pieces it arrives in.
+
+        For a response from stream_response() the body is read from the socket while iterating, so
+        memory use stays bounded by the client's receive size whatever the length of the body, and
+        the body can only be iterated once. A response with a body already read yields it whole.
+
+        :return: An iterator of bytes objects.
+        """
+        if self.chunks is None:
+            if self.body:
+                yield self.body
+            return
+        yield from self.chunks
+
+    def write_to(self, target):
+        """
+        Write the body to a file as it arrives.
+
+        :param target: A binary file object or a file descriptor.
+        :return: The number of bytes written.
+        """
+        written = 0
+        for chunk in self.iter_chunks():
+            if isinstance(target, int):
+                view = memoryview(chunk)
+                while view:
+                    view = view[os.write(target, view):]
+            else:
+                target.write(chunk)
+            written += len(chunk)
+        return written
+
+    def __str__(self):
+        return (self.head + (self.body or b"")).decode('utf-8')
+
 class SimpleHTTPClient:
+    MAX_HEAD_SIZE = 65536
+    RECV_SIZE = 65536
+
     def __init__(self, url):
         """
         Initialize the SimpleHTTPClient with the URL.
 
+        The connection is kept alive between requests: responses are framed by Content-Length or
+        chunked transfer encoding instead of by the server closing the socket.
+
         :param url: The URL to connect to.
         """
         self.url = url
@@ -14,47 +86,234 @@ class SimpleHTTPClient:
         self.port = self.parsed_url.port if self.parsed_url.port else 80
         self.path = self.parsed_url.path if self.parsed_url.path else '/'
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.connected = False
+        self.buffer = bytearray()
+        # Methods of the requests whose responses have not been read yet, oldest first.
+        self.pending = collections.deque()
+        # The response whose body is being streamed, if any.
+        self.streaming = None
 
     def connect(self):
         """
         Connect to the HTTP server.
         """
         self.socket.connect((self.host, self.port))
+        self.connected = True
 
-    def send_request(self, method="GET", headers=None):
+    def send_request(self, method="GET", headers=None, body=None, path=None):
         """
         Send an HTTP request to the server.
 
+        Several requests can be sent before their responses are read (pipelining); the responses are
+        then read in the same order. If the server closed the previous connection, a new one is opened.
+
         :param method: The HTTP method (e.g., 'GET', 'POST').
         :param headers: Additional headers to include in the request.
+        :param body: Optional request body as bytes or a string. Content-Length is added automatically.
+        :param path: The path to request (default: the path of the URL).
         """
         if headers is None:
             headers = {}
+        if not self.connected:
+            if self.pending:
+                raise HTTPResponseError("The server closed the connection with responses still pending.")
+            self.socket.close()
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.buffer.clear()
+            self.connect()
+        if isinstance(body, str):
+            body = body.encode('utf-8')
 
-        request_line = f"{method} {self.path} HTTP/1.1\r\n"
+        request_line = f"{method} {path or self.path} HTTP/1.1\r\n"
         host_header = f"Host: {self.host}\r\n"
         additional_headers = ''.join(f"{key}: {value}\r\n" for key, value in headers.items())
+        if body is not None and not any(key.lower() == 'content-length' for key in headers):
+            additional_headers += f"Content-Length: {len(body)}\r\n"
         empty_line = "\r\n"
 
-        request = request_line + host_header + additional_headers + empty_line
-        self.socket.sendall(request.encode('utf-8'))
+        request = (request_line + host_header + additional_headers + empty_line).encode('utf-8')
+        self.socket.sendall(request + body if body is not None else request)
+        self.pending.append(method.upper())
 
     def receive_response(self):
         """
         Receive the HTTP response from the server.
 
-        :return: The HTTP response as a string.
+        Reads exactly one response and leaves the connection open for the next request.
+
+        :return: The HTTP response as a string: the status line and headers followed by the body,
+                 with any chunked transfer encoding removed.
+        """
+        return str(self.read_response())
+
+    def read_response(self):
+        """
+        Receive and parse the next HTTP response from the server.
+
+        :return: An HTTPResponse with the status, headers and body as bytes.
+        """
+        response = self.stream_response()
+        response.body = b"".join(response.iter_chunks())
+        # The body is complete, so iter_chunks() and write_to() serve it from memory from now on.
+        response.chunks = None
+        return response
+
+    def stream_response(self):
+        """
+        Receive the status line and headers of the next response, leaving the body on the socket.
+
+        Read the body with the response's iter_chunks() or write_to(). Reading the next response
+        first discards the rest of the body; abandoning the iteration part-way closes the connection.
+
+        :return: An HTTPResponse whose body is None.
+        """
+        response = self._read_head()
+        response.chunks = self._body_chunks(response)
+        self.streaming = response
+        return response
+
+    def request(self, method="GET", path=None, headers=None, body=None):
+        """
+        Send a request and read its response.
+
+        :param method: The HTTP method (e.g., 'GET', 'POST').
+        :param path: The path to request (default: the path of the URL).
+        :param headers: Additional headers to include in the request.
+        :param body: Optional request body as bytes or a string.
+        :return: An HTTPResponse.
         """
-        response = bytearray()
+        self.send_request(method, headers, body, path)
+        return self.read_response()
+
+    def _fill(self):
+        data = self.socket.recv(self.RECV_SIZE)
+        if data:
+            self.buffer += data
+        return bool(data)
+
+    def _read_line(self):
+        while True:
+            end = self.buffer.find(b"\r\n")
+            if end >= 0:
+                line = bytes(self.buffer[:end + 2])
+                del self.buffer[:end + 2]
+                return line
+            if len(self.buffer) > self.MAX_HEAD_SIZE:
+                raise HTTPResponseError("Response line is too long.")
+            if not self._fill():
+                raise HTTPResponseError("The server closed the connection mid-response.")
+
+    def _read_head(self):
+        if self.streaming is not None:
+            # Skip whatever the caller did not read of the previous body.
+            for _ in self.streaming.iter_chunks():
+                pass
+            self.streaming = None
+        if not self.pending:
+            raise HTTPResponseError("No request is waiting for a response.")
+        while True:
+            end = self.buffer.find(b"\r\n\r\n")
+            if end >= 0:
+                break
+            if len(self.buffer) > self.MAX_HEAD_SIZE:
+                raise HTTPResponseError("Response headers are too large.")
+            if not self._fill():
+                self.connected = False
+                self.pending.clear()
+                raise HTTPResponseError("The server closed the connection without a response.")
+        head = bytes(self.buffer[:end + 4])
+        del self.buffer[:end + 4]
+        lines = head.decode('iso-8859-1').split("\r\n")
+        parts = lines[0].split(" ", 2)
+        if len(parts) < 2 or not parts[0].startswith("HTTP/") or not parts[1].isdigit():
+            raise HTTPResponseError(f"Malformed status line: {lines[0]!r}")
+        headers = {}
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, separator, value = line.partition(":")
+            if not separator:
+                raise HTTPResponseError(f"Malformed header line: {line!r}")
+            name = name.strip().lower()
+            value = value.strip()
+            headers[name] = f"{headers[name]}, {value}" if name in headers else value
+        response = HTTPResponse(parts[0], int(parts[1]), parts[2] if len(parts) > 2 else "", headers, head)
+        if 100 <= response.status < 200:
+            # An interim response; the final response to the same request follows.
+            return self._read_head()
+        response.method = self.pending.popleft()
+        connection = headers.get('connection', '').lower()
+        response.will_close = ('close' in connection
+                               or (response.version == 'HTTP/1.0' and 'keep-alive' not in connection))
+        return response
+
+    def _body_chunks(self, response):
+        try:
+            yield from self._framed_body(response)
+        except GeneratorExit:
+            # The rest of the body is still on the socket, so the connection cannot be reused.
+            self.close()
+            self.pending.clear()
+            self.buffer.clear()
+            raise
+        if response.will_close:
+            self.connected = False
+
+    def _framed_body(self, response):
+        # Yields the body in pieces as they arrive, following the HTTP/1.1 message length rules.
+        if response.method == 'HEAD' or response.status in (204, 304):
+            pass
+        elif 'chunked' in response.headers.get('transfer-encoding', '').lower():
+            yield from self._chunked_body()
+        elif 'content-length' in response.headers:
+            try:
+                length = int(response.headers['content-length'])
+            except ValueError:
+                raise HTTPResponseError(f"Invalid Content-Length: {response.headers['content-length']!r}")
+            yield from self._sized_body(length)
+        else:
+            # No length given: the body ends when the server closes the connection.
+            response.will_close = True
+            while self.buffer or self._fill():
+                data = bytes(self.buffer)
+                self.buffer.clear()
+                yield data
+
+    def _sized_body(self, length):
+        while length:
+            if not self.buffer:
+                # Large bodies go straight from the socket to the caller without passing through the buffer.
+                data = self.socket.recv(min(length, self.RECV_SIZE))
+                if not data:
+                    raise HTTPResponseError("The server closed the connection mid-response.")
+                length -= len(data)
+                yield data
+                continue
+            size = min(length, len(self.buffer))
+            data = bytes(self.buffer[:size])
+            del self.buffer[:size]
+            length -= size
+            yield data
+
+    def _chunked_body(self):
         while True:
-            part = self.socket.recv(4096)
-            if not part:
+            size_line = self._read_line().split(b";", 1)[0].strip()
+            try:
+                size = int(size_line, 16)
+            except ValueError:
+                raise HTTPResponseError(f"Invalid chunk size: {size_line!r}")
+            if size == 0:
                 break
-            response.extend(part)
-        return response.decode('utf-8')
+            yield from self._sized_body(size)
+            if self._read_line() != b"\r\n":
+                raise HTTPResponseError("Missing CRLF after chunk data.")
+        # Skip trailers up to the empty line that ends the message.
+        while self._read_line() != b"\r\n":
+            pass
 
     def close(self):
         """
         Close the connection to the HTTP server.
         """
-        self.socket.close()
\ No newline at end of file
+        self.socket.close()
+        self.connected = False
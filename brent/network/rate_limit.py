@@ -0,0 +1,52 @@
+import time
+
+class TokenBucket:
+    def __init__(self, rate, burst=None, clock=time.monotonic):
+        """
+        Initialize a token bucket that refills at a constant rate.
+
+        :param rate: Tokens added per second.
+        :param burst: Maximum number of tokens the bucket holds (default: max(1, rate)).
+        :param clock: Function returning the current time in seconds (default: time.monotonic).
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive.")
+        if burst is None:
+            burst = max(1.0, rate)
+        if burst < 1:
+            raise ValueError("burst must be at least 1.")
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = burst
+        self.updated_at = clock()
+
+    def _refill(self, now):
+        if now > self.updated_at:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+
+    def try_acquire(self, tokens=1, now=None):
+        """
+        Take tokens from the bucket if enough are available.
+
+        :param tokens: Number of tokens to take (default: 1).
+        :param now: The current time (default: the bucket's clock).
+        :return: True if the tokens were taken, False otherwise.
+        """
+        self._refill(self.clock() if now is None else now)
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def time_until_available(self, tokens=1, now=None):
+        """
+        Get the number of seconds until the given number of tokens is available.
+
+        :param tokens: Number of tokens needed (default: 1).
+        :param now: The current time (default: the bucket's clock).
+        :return: Seconds to wait, 0.0 if the tokens are available now.
+        """
+        self._refill(self.clock() if now is None else now)
+        return max(0.0, (tokens - self.tokens) / self.rate)
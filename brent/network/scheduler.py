@@ -1,6 +1,63 @@
-import heapq
+import itertools
+import math
 import threading
 import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+
+from brent.network.metrics import SchedulerMetrics
+from brent.network.priority_queue import IndexedPriorityQueue
+from brent.network.rate_limit import TokenBucket
+from brent.network.timer_wheel import TimerWheel
+
+_task_sequence = itertools.count()
+
+class QueueFullError(Exception):
+    """
+    Raised by add_task when the scheduler's queue is full and the overflow policy is 'reject'.
+    """
+
+class TaskExpiredError(Exception):
+    """
+    Set on a task's future when its deadline passed before it could start.
+    """
+
+class DependencyError(Exception):
+    """
+    Set on a task's future when one of the tasks it depends on failed or was cancelled.
+    """
+
+class TaskFuture(Future):
+    def __init__(self, task_id, added=True):
+        """
+        Initialize the future returned by NetworkTaskScheduler.add_task.
+
+        :param task_id: Identifier of the task the future belongs to.
+        :param added: False if add_task coalesced the request into a pending task or dropped it.
+        """
+        super().__init__()
+        self.task_id = task_id
+        self.added = added
+
+def _chain_future(source, target):
+    def copy_state(source):
+        if source.cancelled():
+            target.cancel()
+        elif source.exception() is not None:
+            target.set_exception(source.exception())
+        else:
+            target.set_result(source.result())
+    source.add_done_callback(copy_state)
+
+def _run_chunk(calls):
+    # Runs in a pool process: execute a chunk of (action, args, kwargs) calls and report each outcome.
+    results = []
+    for action, args, kwargs in calls:
+        try:
+            results.append((True, action(*args, **kwargs)))
+        except Exception as e:
+            results.append((False, e))
+    return results
 
 class NetworkTask:
     def __init__(self, priority, task_id, action, *args, **kwargs):
@@ -18,25 +75,116 @@ class NetworkTask:
         self.action = action
         self.args = args
         self.kwargs = kwargs
+        self.sequence = next(_task_sequence)
+        self.run_at = None
+        self.every = None
+        self.timer_handle = None
+        self.cancelled = False
+        self.task_class = None
+        self.backend = 'thread'
+        self.future = None
+        self.waiting = 0
+        self.deadline = None
+        self.timeout = None
+        self.run_number = 0
+        self.run_finished = False
+        self.enqueued_at = None
+        self.started_at = None
+
+    def sort_key(self):
+        # Within a priority band the earliest deadline runs first (tasks without one last), then FIFO.
+        return (self.priority, math.inf if self.deadline is None else self.deadline, self.sequence)
 
     def __lt__(self, other):
-        return self.priority < other.priority
+        return self.sort_key() < other.sort_key()
 
     def run(self):
-        self.action(*self.args, **self.kwargs)
+        return self.action(*self.args, **self.kwargs)
 
 class NetworkTaskScheduler:
-    def __init__(self):
+    DUPLICATE_POLICIES = ('coalesce', 'replace', 'reject')
+    OVERFLOW_POLICIES = ('block', 'reject', 'drop_lowest')
+    BACKENDS = ('thread', 'process')
+
+    def __init__(self, num_workers=1, timer_resolution=0.01, duplicate_policy='coalesce',
+                 max_queue_size=None, overflow_policy='block', process_workers=None,
+                 max_tasks_per_child=None, process_chunk_size=1):
         """
-        Initialize the NetworkTaskScheduler with an empty priority queue.
+        Initialize the NetworkTaskScheduler with an empty priority queue and a pool of worker threads.
+
+        Workers block on a condition variable while the queue is empty, so an idle scheduler does
+        not wake up and a newly added task is dispatched immediately. Delayed and periodic tasks
+        wait in a timer wheel and only enter the priority queue once they are due.
+
+        :param num_workers: Number of worker threads executing tasks (default: 1).
+        :param timer_resolution: Granularity in seconds of delayed and periodic tasks (default: 0.01).
+        :param duplicate_policy: What add_task does when a task with the same task_id is already pending:
+                                 'coalesce' keeps the pending task, moving it to the higher priority and the
+                                 earlier due time of the two, 'replace' cancels the pending task in favour of
+                                 the new one and 'reject' raises a ValueError (default: 'coalesce').
+                                 A periodic task stays pending until it is cancelled, so its task_id coalesces
+                                 later one-shot requests into its next run. Note that task_ids must now be
+                                 unique among pending tasks: with the default policy a second add_task for a
+                                 pending task_id no longer runs the action twice.
+        :param max_queue_size: Maximum number of pending (queued or scheduled) tasks, or None for no limit.
+        :param overflow_policy: What add_task does when the queue is full: 'block' waits for space,
+                                'reject' raises QueueFullError and 'drop_lowest' drops the lowest-priority
+                                pending task, which may be the new one (default: 'block').
+        :param process_workers: Number of processes for tasks added with backend='process', or None to
+                                disable the process backend (default: None).
+        :param max_tasks_per_child: Recycle a pool process after it has run this many chunks, or None to
+                                    keep processes for the scheduler's lifetime (default: None). Setting it
+                                    switches the pool to the 'spawn' start method.
+        :param process_chunk_size: Maximum number of consecutive process tasks sent to the pool in one
+                                   submission (default: 1).
         """
-        self.task_queue = []
-        self.lock = threading.Lock()
+        if num_workers < 1:
+            raise ValueError("num_workers must be at least 1.")
+        if duplicate_policy not in self.DUPLICATE_POLICIES:
+            raise ValueError(f"duplicate_policy must be one of {self.DUPLICATE_POLICIES}.")
+        if max_queue_size is not None and max_queue_size < 1:
+            raise ValueError("max_queue_size must be at least 1.")
+        if overflow_policy not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"overflow_policy must be one of {self.OVERFLOW_POLICIES}.")
+        if process_workers is not None and process_workers < 1:
+            raise ValueError("process_workers must be at least 1.")
+        if process_chunk_size < 1:
+            raise ValueError("process_chunk_size must be at least 1.")
+        self.duplicate_policy = duplicate_policy
+        self.process_pool = None
+        self.process_slots = None
+        self.process_chunk_size = process_chunk_size
+        if process_workers is not None:
+            self.process_pool = ProcessPoolExecutor(max_workers=process_workers,
+                                                    max_tasks_per_child=max_tasks_per_child)
+            # Keep the pool busy without handing it the whole queue, so priorities still apply.
+            self.process_slots = threading.BoundedSemaphore(2 * process_workers)
+        self.max_queue_size = max_queue_size
+        self.overflow_policy = overflow_policy
+        self.rate_limits = {}
+        self.metrics = SchedulerMetrics()
+        self.task_queue = IndexedPriorityQueue()
+        self.scheduled = {}
+        self.periodic = {}
+        self.blocked = {}
+        self.active = {}
+        # Re-entrant because completing a future runs the done callbacks of dependent tasks, which take the lock.
+        self.lock = threading.RLock()
+        self.task_available = threading.Condition(self.lock)
+        self.space_available = threading.Condition(self.lock)
+        self.timer_changed = threading.Condition(self.lock)
+        self.timer_wheel = TimerWheel(tick=timer_resolution, start_time=time.monotonic())
         self.stop_event = threading.Event()
-        self.worker_thread = threading.Thread(target=self._worker)
-        self.worker_thread.start()
+        self.timer_thread = threading.Thread(target=self._timer_worker, name="NetworkTaskScheduler-timer")
+        self.timer_thread.start()
+        self.workers = []
+        for index in range(num_workers):
+            worker = threading.Thread(target=self._worker, name=f"NetworkTaskScheduler-worker-{index}")
+            worker.start()
+            self.workers.append(worker)
 
-    def add_task(self, priority, task_id, action, *args, **kwargs):
+    def add_task(self, priority, task_id, action, *args, run_at=None, delay=None, every=None, task_class=None,
+                 backend='thread', depends_on=None, deadline=None, timeout=None, **kwargs):
         """
         Add a task to the scheduler.
 
@@ -44,32 +192,466 @@ class NetworkTaskScheduler:
         :param task_id: Unique identifier for the task.
         :param action: The function to be executed as the task.
         :param args: Positional arguments for the action.
+        :param run_at: Time on the time.monotonic() clock at which the task becomes due.
+        :param delay: Seconds from now after which the task becomes due. Mutually exclusive with run_at.
+        :param every: Re-run the task every given number of seconds. The first run happens at run_at,
+                      after delay, or immediately if neither is given.
+        :param task_class: Optional class or destination of the task, used to look up its rate limit.
+        :param backend: 'thread' runs the action on a worker thread; 'process' runs it in the process pool,
+                        which requires a picklable action and arguments (default: 'thread').
+        :param depends_on: Optional list of task_ids that must complete successfully before this task is
+                           released. Ids that are not pending or running are treated as already completed.
+                           If a dependency fails or is cancelled, the task's future fails with DependencyError.
+        :param deadline: Optional time on the time.monotonic() clock by which the task must start. Tasks of
+                         equal priority run earliest deadline first; a task still waiting at its deadline is
+                         not run and its future fails with TaskExpiredError. Not allowed for periodic tasks.
+        :param timeout: Optional maximum run time in seconds. When it is exceeded the future fails with
+                        TimeoutError and the worker moves on; the action itself cannot be interrupted and
+                        keeps running in the background. Thread tasks with a timeout run on a helper thread.
         :param kwargs: Keyword arguments for the action.
+        :return: A TaskFuture resolved with the action's return value or exception. Its `added` attribute is
+                 False if the request was coalesced into a pending task with the same task_id (the future then
+                 follows that task) or dropped by the overflow policy (the future is then cancelled). For a
+                 periodic task the future is resolved by the first run.
         """
+        if run_at is not None and delay is not None:
+            raise ValueError("run_at and delay are mutually exclusive.")
+        if every is not None and every <= 0:
+            raise ValueError("every must be positive.")
+        if backend not in self.BACKENDS:
+            raise ValueError(f"backend must be one of {self.BACKENDS}.")
+        if backend == 'process' and self.process_pool is None:
+            raise ValueError("The process backend requires process_workers to be set.")
+        if deadline is not None and every is not None:
+            raise ValueError("Periodic tasks cannot have a deadline.")
+        if timeout is not None and timeout <= 0:
+            raise ValueError("timeout must be positive.")
+        task = NetworkTask(priority, task_id, action, *args, **kwargs)
+        task.every = every
+        task.task_class = task_class
+        task.backend = backend
+        task.future = TaskFuture(task_id)
+        task.deadline = deadline
+        task.timeout = timeout
+        if delay is not None:
+            run_at = time.monotonic() + delay
         with self.lock:
-            task = NetworkTask(priority, task_id, action, *args, **kwargs)
-            heapq.heappush(self.task_queue, task)
-    
+            room = None
+            while room is None:
+                pending = self._find_pending(task_id)
+                if pending is not None:
+                    if self.duplicate_policy == 'reject':
+                        raise ValueError(f"Task '{task_id}' is already pending.")
+                    if self.duplicate_policy == 'coalesce':
+                        if every is not None and every != pending.every:
+                            raise ValueError(f"Task '{task_id}' is already pending with a different period.")
+                        if priority < pending.priority:
+                            self._set_priority(pending, priority)
+                        self._advance_run_at(pending, run_at)
+                        future = TaskFuture(task_id, added=False)
+                        _chain_future(pending.future, future)
+                        return future
+                    self._cancel(task_id)
+                # A producer that had to wait for space checks for duplicates again before adding.
+                room = self._make_room(task)
+            if not room:
+                task.future.added = False
+                task.future.cancel()
+                return task.future
+            dependencies = [self.active[dependency].future for dependency in depends_on or ()
+                            if dependency in self.active]
+            if every is not None:
+                self.periodic[task_id] = task
+            self.active[task_id] = task
+            task.run_at = run_at
+            if dependencies:
+                task.waiting = len(dependencies)
+                self.blocked[task_id] = task
+                for dependency in dependencies:
+                    # Runs immediately for dependencies that have already completed.
+                    dependency.add_done_callback(partial(self._dependency_done, task))
+            else:
+                self._release(task)
+            return task.future
+
+    def _release(self, task):
+        now = time.monotonic()
+        if task.run_at is None or task.run_at <= now:
+            task.run_at = now
+            self._enqueue(task)
+        else:
+            self._schedule(task)
+
+    def _dependency_done(self, task, dependency):
+        with self.lock:
+            if self.blocked.get(task.task_id) is not task:
+                return
+            if dependency.cancelled() or dependency.exception() is not None:
+                del self.blocked[task.task_id]
+                self._discard(task)
+                task.future.set_exception(DependencyError(f"A dependency of task '{task.task_id}' did not complete."))
+                return
+            task.waiting -= 1
+            if task.waiting == 0:
+                del self.blocked[task.task_id]
+                self._release(task)
+
+    def _discard(self, task):
+        task.cancelled = True
+        if self.periodic.get(task.task_id) is task:
+            del self.periodic[task.task_id]
+        if self.active.get(task.task_id) is task:
+            del self.active[task.task_id]
+
+    def set_rate_limit(self, task_class, rate, burst=None):
+        """
+        Limit how often tasks of a class are started. Tasks over the limit are deferred, not dropped.
+
+        :param task_class: The task class or destination the limit applies to.
+        :param rate: Maximum sustained number of task starts per second.
+        :param burst: Number of tasks that may start back to back (default: max(1, rate)).
+        """
+        with self.lock:
+            self.rate_limits[task_class] = TokenBucket(rate, burst)
+
+    def remove_rate_limit(self, task_class):
+        """
+        Remove the rate limit of a task class.
+
+        :param task_class: The task class or destination the limit applies to.
+        """
+        with self.lock:
+            self.rate_limits.pop(task_class, None)
+
+    def get_counters(self):
+        """
+        Get the throughput, overflow and rate limiting counters.
+
+        :return: A dictionary with the number of enqueued, started, completed, failed, rejected, dropped,
+                 rate limited (deferred), expired and timed out tasks.
+        """
+        with self.lock:
+            return dict(self.metrics.counters)
+
+    def get_metrics(self):
+        """
+        Get a snapshot of the scheduler metrics.
+
+        :return: A dictionary with the counters, per-priority histograms of the wait between a task becoming
+                 due and starting ('wait_time') and of its run time ('run_time'), and a histogram of the
+                 queue depth seen by the workers ('queue_depth'). See SchedulerMetrics.snapshot().
+        """
+        with self.lock:
+            return self.metrics.snapshot()
+
+    def _make_room(self, task):
+        # Returns True if the task can be added, False if it was dropped and None after waiting for space.
+        if self.max_queue_size is None or len(self.task_queue) + len(self.scheduled) < self.max_queue_size:
+            return True
+        if self.stop_event.is_set():
+            raise RuntimeError("The scheduler is stopped.")
+        if self.overflow_policy == 'block':
+            self.space_available.wait()
+            return None
+        if self.overflow_policy == 'reject':
+            self.metrics.increment('rejected')
+            raise QueueFullError(f"Task '{task.task_id}' rejected: the queue is full.")
+        candidates = [pending for pending in self.task_queue if pending.every is None]
+        candidates.extend(pending for pending in self.scheduled.values() if pending.every is None)
+        victim = max(candidates, key=NetworkTask.sort_key, default=None)
+        self.metrics.increment('dropped')
+        if victim is None or victim < task:
+            return False
+        self._cancel(victim.task_id)
+        return True
+
+    def cancel(self, task_id):
+        """
+        Cancel a pending task. A periodic task is not run again, even if it is currently running.
+
+        :param task_id: The identifier of the task.
+        :return: True if a pending task or a periodic task (including one that is currently running)
+                 was cancelled, False otherwise.
+        """
+        with self.lock:
+            return self._cancel(task_id)
+
+    def update_priority(self, task_id, priority):
+        """
+        Change the priority of a pending task.
+
+        :param task_id: The identifier of the task.
+        :param priority: The new priority (lower number means higher priority).
+        :return: True if a pending task was updated, False otherwise.
+        """
+        with self.lock:
+            task = self._find_pending(task_id)
+            if task is None:
+                return False
+            self._set_priority(task, priority)
+            return True
+
+    def _find_pending(self, task_id):
+        task = self.task_queue.get(task_id)
+        if task is None:
+            task = self.scheduled.get(task_id)
+        if task is None:
+            task = self.blocked.get(task_id)
+        if task is None:
+            task = self.periodic.get(task_id)
+        return task
+
+    def _set_priority(self, task, priority):
+        task.priority = priority
+        if task.task_id in self.task_queue and self.task_queue.get(task.task_id) is task:
+            self.task_queue.update(task.task_id)
+
+    def _advance_run_at(self, task, run_at):
+        if self.blocked.get(task.task_id) is task:
+            if run_at is None or (task.run_at is not None and run_at < task.run_at):
+                task.run_at = run_at
+            return
+        # Only a task waiting in the timer wheel can be made due earlier; a queued task is already due.
+        if self.scheduled.get(task.task_id) is not task:
+            return
+        now = time.monotonic()
+        if run_at is not None and run_at >= task.run_at:
+            return
+        self.timer_wheel.remove(task.timer_handle)
+        del self.scheduled[task.task_id]
+        task.timer_handle = None
+        if run_at is None or run_at <= now:
+            task.run_at = now
+            self._enqueue(task)
+        else:
+            task.run_at = run_at
+            self._schedule(task)
+
+    def _cancel(self, task_id):
+        task = None
+        if task_id in self.task_queue:
+            task = self.task_queue.remove(task_id)
+        elif task_id in self.scheduled:
+            task = self.scheduled.pop(task_id)
+            self.timer_wheel.remove(task.timer_handle)
+        elif task_id in self.blocked:
+            task = self.blocked.pop(task_id)
+        periodic = self.periodic.get(task_id)
+        if periodic is not None:
+            task = periodic
+        if task is None:
+            return False
+        self._discard(task)
+        self.space_available.notify()
+        task.future.cancel()
+        return True
+
+    def _enqueue(self, task):
+        if task.enqueued_at is None:
+            # Kept when a rate-limited task is deferred, so its wait includes the time it was held back.
+            task.enqueued_at = time.monotonic()
+            self.metrics.increment('enqueued')
+        self.task_queue.push(task)
+        self.task_available.notify()
+
+    def _schedule(self, task):
+        task.timer_handle = self.timer_wheel.add(task.run_at, task)
+        self.scheduled[task.task_id] = task
+        self.timer_changed.notify()
+
+    def _timer_worker(self):
+        with self.lock:
+            while not self.stop_event.is_set():
+                for task in self.timer_wheel.advance(time.monotonic()):
+                    del self.scheduled[task.task_id]
+                    task.timer_handle = None
+                    self._enqueue(task)
+                next_expiry = self.timer_wheel.next_expiry()
+                if next_expiry is None:
+                    self.timer_changed.wait()
+                else:
+                    self.timer_changed.wait(max(0.0, next_expiry - time.monotonic()))
+
     def _worker(self):
-        while not self.stop_event.is_set():
-            with self.lock:
-                if self.task_queue:
-                    task = heapq.heappop(self.task_queue)
-                    task.run()
-            time.sleep(0.1)  # Adjust the sleep time as needed
+        while True:
+            with self.task_available:
+                task = None
+                while task is None:
+                    while not self.task_queue and not self.stop_event.is_set():
+                        self.task_available.wait()
+                    if self.stop_event.is_set():
+                        return
+                    task = self._next_task()
+                chunk = None
+                if task.backend == 'process':
+                    chunk = [task]
+                    while (len(chunk) < self.process_chunk_size and self.task_queue
+                           and self.task_queue.peek().backend == 'process'):
+                        next_task = self._next_task()
+                        if next_task is not None:
+                            chunk.append(next_task)
+            if chunk is not None:
+                self._submit_chunk(chunk)
+                continue
+            # The action runs outside the lock so producers and other workers are never blocked by it.
+            if task.timeout is not None:
+                self._run_with_timeout(task)
+                continue
+            try:
+                result = task.run()
+            except Exception as e:
+                self._finish(task, task.run_number, error=e)
+            else:
+                self._finish(task, task.run_number, result=result)
+
+    def _run_with_timeout(self, task):
+        run_number = task.run_number
+
+        def run():
+            try:
+                result = task.run()
+            except Exception as e:
+                self._finish(task, run_number, error=e)
+            else:
+                self._finish(task, run_number, result=result)
+
+        runner = threading.Thread(target=run, name=f"NetworkTaskScheduler-task-{task.task_id}", daemon=True)
+        runner.start()
+        runner.join(task.timeout)
+        if runner.is_alive():
+            self._time_out(task, run_number)
+
+    def _time_out(self, task, run_number):
+        with self.lock:
+            if task.run_number == run_number and not task.run_finished:
+                self.metrics.increment('timed_out')
+                self._finish(task, run_number, error=TimeoutError(f"Task '{task.task_id}' timed out after {task.timeout} seconds."))
+
+    def _submit_chunk(self, chunk):
+        # Blocks only while the pool already has two chunks per process in flight.
+        self.process_slots.acquire()
+        calls = [(task.action, task.args, task.kwargs) for task in chunk]
+        run_numbers = [task.run_number for task in chunk]
+        try:
+            future = self.process_pool.submit(_run_chunk, calls)
+        except Exception as e:
+            self.process_slots.release()
+            for task, run_number in zip(chunk, run_numbers):
+                self._finish(task, run_number, error=e)
+            return
+        timers = []
+        for task, run_number in zip(chunk, run_numbers):
+            if task.timeout is not None:
+                timer = threading.Timer(task.timeout, self._time_out, args=(task, run_number))
+                timer.daemon = True
+                timer.start()
+                timers.append(timer)
+        future.add_done_callback(lambda future: self._process_chunk_done(chunk, run_numbers, timers, future))
+
+    def _process_chunk_done(self, chunk, run_numbers, timers, future):
+        self.process_slots.release()
+        for timer in timers:
+            timer.cancel()
+        try:
+            results = future.result()
+        except Exception as e:
+            # The whole chunk failed, e.g. because it could not be pickled or a pool process died.
+            results = [(False, e)] * len(chunk)
+        for task, run_number, (ok, value) in zip(chunk, run_numbers, results):
+            if ok:
+                self._finish(task, run_number, result=value)
+            else:
+                self._finish(task, run_number, error=value)
+
+    def _finish(self, task, run_number, result=None, error=None):
+        with self.lock:
+            if task.run_number != run_number or task.run_finished:
+                # The run already timed out; its late outcome is ignored.
+                return
+            task.run_finished = True
+            self.metrics.observe_run(task.priority, time.monotonic() - task.started_at)
+            self.metrics.increment('completed' if error is None else 'failed')
+            if not task.future.done():
+                if error is None:
+                    task.future.set_result(result)
+                else:
+                    task.future.set_exception(error)
+            elif error is not None:
+                # Later runs of a periodic task have no future to report to.
+                print(f"Task {task.task_id} failed: {error}")
+            if task.every is not None and not self.stop_event.is_set() and not task.cancelled:
+                task.run_at = max(task.run_at + task.every, time.monotonic())
+                self._schedule(task)
+            elif self.active.get(task.task_id) is task:
+                del self.active[task.task_id]
+
+    def _next_task(self):
+        self.metrics.observe_depth(len(self.task_queue))
+        task = self.task_queue.pop()
+        self.space_available.notify()
+        if task.future.cancelled():
+            # The caller cancelled the future while the task was queued.
+            self._discard(task)
+            return None
+        bucket = self.rate_limits.get(task.task_class)
+        if bucket is not None and not bucket.try_acquire():
+            # Over the limit: park the task in the timer wheel until the bucket has a token again.
+            self.metrics.increment('rate_limited')
+            task.run_at = time.monotonic() + bucket.time_until_available()
+            self._schedule(task)
+            return None
+        now = time.monotonic()
+        if task.deadline is not None and now > task.deadline:
+            self.metrics.increment('expired')
+            self._discard(task)
+            task.future.set_exception(TaskExpiredError(f"Task '{task.task_id}' missed its deadline before starting."))
+            return None
+        if not task.future.done() and not task.future.running() and not task.future.set_running_or_notify_cancel():
+            self._discard(task)
+            return None
+        task.run_number += 1
+        task.run_finished = False
+        self.metrics.observe_wait(task.priority, now - task.enqueued_at)
+        self.metrics.increment('started')
+        task.enqueued_at = None
+        task.started_at = now
+        return task
 
     def stop(self):
         """
-        Stop the scheduler and wait for the worker thread to finish.
+        Stop the scheduler and wait for the worker threads to finish.
+
+        Tasks that are still queued, scheduled or waiting for dependencies are not executed and their
+        futures are cancelled.
         """
-        self.stop_event.set()
-        self.worker_thread.join()
+        with self.lock:
+            self.stop_event.set()
+            pending = list(self.task_queue) + list(self.scheduled.values()) + list(self.blocked.values())
+            for task in pending:
+                self._cancel(task.task_id)
+            self.task_available.notify_all()
+            self.space_available.notify_all()
+            self.timer_changed.notify_all()
+        self.timer_thread.join()
+        for worker in self.workers:
+            worker.join()
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait=True, cancel_futures=True)
 
     def get_task_count(self):
         """
         Get the number of tasks in the scheduler.
 
-        :return: The number of tasks in the priority queue.
+        :return: The number of tasks in the priority queue, the timer wheel and waiting for dependencies.
+        """
+        with self.lock:
+            return len(self.task_queue) + len(self.scheduled) + len(self.blocked)
+
+    def get_scheduled_count(self):
+        """
+        Get the number of delayed or periodic tasks that are not due yet.
+
+        :return: The number of tasks in the timer wheel.
         """
         with self.lock:
-            return len(self.task_queue)
+            return len(self.scheduled)
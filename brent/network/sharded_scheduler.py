@@ -0,0 +1,177 @@
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+
+from brent.network.scheduler import NetworkTask
+
+class _Shard:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.queue = []
+        self.idle = False
+
+class ShardedNetworkTaskScheduler:
+    def __init__(self, num_workers=4):
+        """
+        Initialize the ShardedNetworkTaskScheduler.
+
+        Every worker owns a shard with its own lock and priority queue. Each producer thread adds
+        to one shard, so producers do not contend on a single lock. A worker runs its own shard in
+        priority order and steals the highest-priority task it can see from other shards when its
+        own is empty. Ordering is therefore only approximately global.
+
+        :param num_workers: Number of worker threads, and of shards (default: 4).
+        """
+        if num_workers < 1:
+            raise ValueError("num_workers must be at least 1.")
+        self.shards = [_Shard() for _ in range(num_workers)]
+        self.idle_lock = threading.Lock()
+        self.idle_workers = []
+        self.producer_shards = itertools.count()
+        self.local = threading.local()
+        self.stop_event = threading.Event()
+        self.workers = []
+        for index in range(num_workers):
+            worker = threading.Thread(target=self._worker, args=(index,),
+                                      name=f"ShardedNetworkTaskScheduler-worker-{index}")
+            worker.start()
+            self.workers.append(worker)
+
+    def add_task(self, priority, task_id, action, *args, **kwargs):
+        """
+        Add a task to the calling thread's shard.
+
+        :param priority: Priority of the task (lower number means higher priority).
+        :param task_id: Identifier for the task.
+        :param action: The function to be executed as the task.
+        :param args: Positional arguments for the action.
+        :param kwargs: Keyword arguments for the action.
+        :return: A concurrent.futures.Future resolved with the action's return value or exception.
+        """
+        if self.stop_event.is_set():
+            raise RuntimeError("The scheduler is stopped.")
+        task = NetworkTask(priority, task_id, action, *args, **kwargs)
+        task.future = Future()
+        shard = self.shards[self._home_shard()]
+        with shard.lock:
+            heapq.heappush(shard.queue, task)
+            owner_idle = shard.idle
+            if owner_idle:
+                shard.idle = False
+                shard.wakeup.notify()
+        if not owner_idle:
+            # The owner is busy, so hand the task to an idle worker if there is one.
+            self._wake_idle_worker()
+        return task.future
+
+    def _home_shard(self):
+        shard = getattr(self.local, 'shard', None)
+        if shard is None:
+            shard = self.local.shard = next(self.producer_shards) % len(self.shards)
+        return shard
+
+    def _wake_idle_worker(self):
+        while True:
+            with self.idle_lock:
+                if not self.idle_workers:
+                    return
+                index = self.idle_workers.pop()
+            shard = self.shards[index]
+            with shard.lock:
+                # Entries can be stale when the owner was already woken through its own shard.
+                if shard.idle:
+                    shard.idle = False
+                    shard.wakeup.notify()
+                    return
+
+    def _pop(self, shard):
+        with shard.lock:
+            if shard.queue:
+                return heapq.heappop(shard.queue)
+        return None
+
+    def _steal(self, index):
+        best = None
+        for offset in range(1, len(self.shards)):
+            victim = self.shards[(index + offset) % len(self.shards)]
+            try:
+                # Unlocked peek; it is only a hint and is re-checked under the victim's lock.
+                head = victim.queue[0]
+            except IndexError:
+                continue
+            if best is None or head < best[1]:
+                best = (victim, head)
+        if best is None:
+            return None
+        return self._pop(best[0])
+
+    def _find_task(self, index):
+        task = self._pop(self.shards[index])
+        if task is None:
+            task = self._steal(index)
+        return task
+
+    def _go_idle(self, index):
+        shard = self.shards[index]
+        with shard.lock:
+            if shard.queue:
+                return
+            shard.idle = True
+        with self.idle_lock:
+            self.idle_workers.append(index)
+        # Work added to a busy shard before we registered as idle would otherwise wait for its owner.
+        task = self._steal(index)
+        with shard.lock:
+            if task is not None or shard.queue:
+                shard.idle = False
+            while shard.idle and not self.stop_event.is_set():
+                shard.wakeup.wait()
+        if task is not None:
+            self._run(task)
+
+    def _run(self, task):
+        if not task.future.set_running_or_notify_cancel():
+            return
+        try:
+            result = task.run()
+        except Exception as e:
+            task.future.set_exception(e)
+        else:
+            task.future.set_result(result)
+
+    def _worker(self, index):
+        while not self.stop_event.is_set():
+            task = self._find_task(index)
+            if task is None:
+                self._go_idle(index)
+            else:
+                self._run(task)
+
+    def stop(self):
+        """
+        Stop the scheduler and wait for the worker threads to finish.
+
+        Tasks that are still queued are not executed and their futures are cancelled.
+        """
+        self.stop_event.set()
+        for shard in self.shards:
+            with shard.lock:
+                shard.idle = False
+                shard.wakeup.notify_all()
+        for worker in self.workers:
+            worker.join()
+        for shard in self.shards:
+            with shard.lock:
+                for task in shard.queue:
+                    task.future.cancel()
+                shard.queue.clear()
+
+    def get_task_count(self):
+        """
+        Get the number of tasks in the scheduler.
+
+        :return: The number of queued tasks across all shards.
+        """
+        return sum(len(shard.queue) for shard in self.shards)
@@ -0,0 +1,148 @@
+import math
+
+class TimerWheel:
+    def __init__(self, tick=0.01, slots=256, levels=4, start_time=0.0):
+        """
+        Initialize a hierarchical timer wheel.
+
+        Level 0 has one slot per tick; each higher level has slots that are `slots` times coarser.
+        Inserting and removing a timer is O(1); timers on higher levels cascade down as time advances.
+
+        :param tick: Resolution of the wheel in seconds (default: 0.01).
+        :param slots: Number of slots per level (default: 256).
+        :param levels: Number of levels (default: 4). Timers beyond the wheel's range are clamped to the top level and re-cascaded.
+        :param start_time: The time the wheel starts at, on the same clock as the deadlines passed to add().
+        """
+        if tick <= 0:
+            raise ValueError("tick must be positive.")
+        if slots < 2 or levels < 1:
+            raise ValueError("The wheel needs at least 2 slots and 1 level.")
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.wheels = [[{} for _ in range(slots)] for _ in range(levels)]
+        self.spans = [slots ** level for level in range(levels + 1)]
+        self.current_tick = self._to_tick(start_time)
+        self.expired = []
+        self.count = 0
+
+    def _to_tick(self, when):
+        return math.ceil(when / self.tick)
+
+    def add(self, when, item):
+        """
+        Schedule an item to expire at a given time.
+
+        :param when: The expiry time, on the same clock as advance().
+        :param item: The item returned by advance() once the time is reached.
+        :return: A handle that can be passed to remove().
+        """
+        entry = [self._to_tick(when), item, None]
+        self.count += 1
+        self._place(entry)
+        return entry
+
+    def remove(self, handle):
+        """
+        Remove a timer before it expires.
+
+        :param handle: The handle returned by add().
+        """
+        slot = handle[2]
+        if slot is not None:
+            del slot[id(handle)]
+            handle[2] = None
+        else:
+            self.expired.remove(handle[1])
+        self.count -= 1
+
+    def _place(self, entry):
+        expiry = entry[0]
+        delta = expiry - self.current_tick
+        if delta <= 0:
+            entry[2] = None
+            self.expired.append(entry[1])
+            return
+        for level in range(self.levels):
+            if delta < self.spans[level + 1]:
+                break
+        else:
+            level = self.levels - 1
+            expiry = self.current_tick + self.spans[self.levels] - 1
+        slot = self.wheels[level][(expiry // self.spans[level]) % self.slots]
+        slot[id(entry)] = entry
+        entry[2] = slot
+
+    def advance(self, now):
+        """
+        Advance the wheel to the given time.
+
+        Empty ticks are skipped: the wheel jumps straight to the next tick that expires or cascades
+        a non-empty slot, so advancing past long idle stretches costs nothing per elapsed tick.
+
+        :param now: The current time.
+        :return: A list of the items that expired, in no particular order.
+        """
+        target = math.floor(now / self.tick)
+        while self.current_tick < target:
+            next_tick = self._next_event_tick()
+            if next_tick is None or next_tick > target:
+                self.current_tick = target
+                break
+            self.current_tick = next_tick
+            for level in range(self.levels - 1, 0, -1):
+                if self.current_tick % self.spans[level] == 0:
+                    slot = self.wheels[level][(self.current_tick // self.spans[level]) % self.slots]
+                    if slot:
+                        entries = list(slot.values())
+                        slot.clear()
+                        for entry in entries:
+                            self._place(entry)
+            slot = self.wheels[0][self.current_tick % self.slots]
+            if slot:
+                entries = list(slot.values())
+                slot.clear()
+                for entry in entries:
+                    # With a single level, timers beyond the wheel's range are clamped into level 0
+                    # and are placed again here until they are due.
+                    self._place(entry)
+        expired = self.expired
+        self.expired = []
+        self.count -= len(expired)
+        return expired
+
+    def _next_event_tick(self):
+        # The first tick after the current one at which a non-empty slot expires (level 0) or cascades.
+        if self.count == len(self.expired):
+            return None
+        best = None
+        for level in range(self.levels):
+            span = self.spans[level]
+            base = self.current_tick // span
+            for offset in range(1, self.slots + 1):
+                boundary = (base + offset) * span
+                if best is not None and boundary >= best:
+                    break
+                if self.wheels[level][(base + offset) % self.slots]:
+                    best = boundary
+                    break
+        return best
+
+    def next_expiry(self):
+        """
+        Get a lower bound for the next time advance() can return items.
+
+        The bound is exact for timers on level 0 and otherwise the time of the next cascade that
+        involves a non-empty slot, so waiting until it never misses a timer.
+
+        :return: The time as a float, or None if the wheel is empty.
+        """
+        if self.count == 0:
+            return None
+        if self.expired:
+            return self.current_tick * self.tick
+        next_tick = self._next_event_tick()
+        return None if next_tick is None else next_tick * self.tick
+
+    def __len__(self):
+        return self.count
@@ -1,9 +1,11 @@
+import asyncio
 import unittest
 from unittest.mock import patch, MagicMock
 from brent.binary_execution.executor import BinaryExecutor
 import subprocess
 import tempfile
 import os
+import time
 
 class TestBinaryExecutor(unittest.TestCase):
 
@@ -67,5 +69,72 @@ class TestBinaryExecutor(unittest.TestCase):
         expected_env.update({'ENV_VAR': 'value'})
         mock_run.assert_called_once_with([self.binary_path], check=True, capture_output=True, text=True, env=expected_env)
 
+class TestExecuteMany(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.binary_path = os.path.join(self.temp_dir.name, 'binary')
+        # Sleeps for $1 seconds, then prints $2 and exits with status $3.
+        with open(self.binary_path, 'w') as f:
+            f.write("#!/bin/sh\nsleep \"$1\"\necho \"$2\"\necho err >&2\nexit \"${3:-0}\"\n")
+        os.chmod(self.binary_path, 0o755)
+        self.executor = BinaryExecutor(self.binary_path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_results_arrive_as_they_complete(self):
+        arg_lists = [['0.6', 'slow'], ['0', 'fast', '3'], ['0.2', 'medium']]
+        results = list(self.executor.execute_many(arg_lists, max_concurrency=3))
+        self.assertEqual([result.stdout for result in results], ["fast\n", "medium\n", "slow\n"])
+        self.assertEqual([result.index for result in results], [1, 2, 0])
+        self.assertEqual(results[0].returncode, 3)
+        self.assertEqual(results[0].stderr, "err\n")
+        self.assertEqual(results[0].args, ['0', 'fast', '3'])
+        self.assertGreaterEqual(results[2].duration, 0.6)
+
+    def test_max_concurrency_limits_running_processes(self):
+        start_time = time.perf_counter()
+        results = list(self.executor.execute_many([['0.3', str(index)] for index in range(4)], max_concurrency=2))
+        elapsed = time.perf_counter() - start_time
+        self.assertEqual(sorted(result.stdout for result in results), [f"{index}\n" for index in range(4)])
+        self.assertGreaterEqual(elapsed, 0.6)
+        self.assertLess(elapsed, 1.2)
+
+    def test_timeout_kills_only_the_slow_call(self):
+        results = sorted(self.executor.execute_many([['5', 'stuck'], ['0', 'ok']], timeout=0.5),
+                         key=lambda result: result.index)
+        self.assertTrue(results[0].timed_out)
+        self.assertLess(results[0].returncode, 0)
+        self.assertLess(results[0].duration, 3)
+        self.assertFalse(results[1].timed_out)
+        self.assertEqual(results[1].stdout, "ok\n")
+
+    def test_closing_early_cancels_the_rest(self):
+        start_time = time.perf_counter()
+        results = self.executor.execute_many([['0', 'first']] + [['5', 'never']] * 10, max_concurrency=4)
+        self.assertEqual(next(results).stdout, "first\n")
+        results.close()
+        self.assertLess(time.perf_counter() - start_time, 3)
+
+    def test_async_iteration_and_cancellation(self):
+        async def run():
+            seen = []
+            async for result in self.executor.execute_many_async([['0', str(index)] for index in range(5)]):
+                seen.append(result.index)
+            task = asyncio.ensure_future(self._consume([['5', 'never']] * 3))
+            await asyncio.sleep(0.2)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            return seen
+
+        start_time = time.perf_counter()
+        self.assertEqual(sorted(asyncio.run(run())), list(range(5)))
+        self.assertLess(time.perf_counter() - start_time, 3)
+
+    async def _consume(self, arg_lists):
+        return [result async for result in self.executor.execute_many_async(arg_lists)]
+
 if __name__ == '__main__':
     unittest.main()
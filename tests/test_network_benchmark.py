@@ -0,0 +1,43 @@
+import json
+import unittest
+from brent.network.benchmark import LoopbackServer, percentile, run_benchmark, run_suite, to_json
+from brent.network.protocols.http import SimpleHTTPClient
+
+class TestNetworkBenchmark(unittest.TestCase):
+
+    def test_percentile_nearest_rank(self):
+        values = list(range(1, 1001))
+        self.assertEqual(percentile(values, 50), 500)
+        self.assertEqual(percentile(values, 99), 990)
+        self.assertEqual(percentile(values, 99.9), 999)
+        self.assertEqual(percentile([7], 99.9), 7)
+        self.assertIsNone(percentile([], 50))
+
+    def test_http_stand_in_echoes_bodies(self):
+        with LoopbackServer('http') as server:
+            client = SimpleHTTPClient(f"http://127.0.0.1:{server.port}/echo")
+            for body in (b"", b"hello", bytes(100000)):
+                response = client.request("POST", body=body)
+                self.assertEqual((response.status, response.body), (200, body))
+            client.close()
+
+    def test_suite_reports_every_combination_as_json(self):
+        results = run_suite(sizes=(16, 4096), concurrency=(1, 3), messages=30)
+        self.assertEqual(len(results), 3 * 2 * 2)
+        for result in results:
+            self.assertEqual(result['messages'], 30 // result['concurrency'] * result['concurrency'])
+            self.assertGreater(result['msgs_per_s'], 0)
+            self.assertLessEqual(result['p50_us'], result['p99_us'])
+            self.assertLessEqual(result['p99_us'], result['p999_us'])
+        document = json.loads(to_json(results))
+        self.assertEqual(document['results'], results)
+        self.assertIn('python', document)
+
+    def test_failed_client_raises(self):
+        with LoopbackServer('echo') as server:
+            port = server.port
+        with self.assertRaises(RuntimeError):
+            run_benchmark('tcp', port, 16, messages=10)
+
+if __name__ == '__main__':
+    unittest.main()
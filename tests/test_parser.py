@@ -0,0 +1,226 @@
+import importlib.util
+import os
+import struct
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+from brent.binary_execution.cache import ParseCache
+from brent.binary_execution.parser import BinaryParser, DelimitedFormat, RecordSchema, get_struct
+
+HAS_NUMPY = importlib.util.find_spec('numpy') is not None
+
+def sum_ids(records):
+    return sum(record[0] for record in records)
+
+def add(total, value):
+    return total + value
+
+class TestBinaryParser(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.binary_path = os.path.join(self.temp_dir.name, 'binary')
+        with open(self.binary_path, 'wb') as f:
+            f.write(struct.pack('I', 7) + struct.pack('d', 2.5) + b"sensor".ljust(16, b"\x00"))
+            f.write(struct.pack('<HHI', 1, 2, 3))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_mmap_mode_matches_read_mode(self):
+        expected = {'header': 7, 'value': 2.5, 'name': 'sensor'}
+        self.assertEqual(BinaryParser(self.binary_path).parse(), expected)
+        with BinaryParser(self.binary_path, use_mmap=True) as parser:
+            self.assertEqual(parser.parse(), expected)
+            self.assertEqual(parser.parse_section(28, 8, '<HHI'), (1, 2, 3))
+        self.assertEqual(BinaryParser(self.binary_path).parse_section(28, 8, '<HHI'), (1, 2, 3))
+
+    def test_mmap_sections_are_bounds_checked(self):
+        with BinaryParser(self.binary_path, use_mmap=True) as parser:
+            with self.assertRaises(struct.error):
+                parser.parse_section(32, 8, '<HHI')
+            with self.assertRaises(struct.error):
+                parser.parse_section(0, 4, '<HHI')
+            section = parser.section_view(28, 8)
+            self.assertEqual(bytes(section), struct.pack('<HHI', 1, 2, 3))
+            section.release()
+            with self.assertRaises(ValueError):
+                parser.section_view(30, 8)
+        with self.assertRaises(ValueError):
+            parser.parse()
+
+    def test_structs_are_compiled_once(self):
+        self.assertIs(get_struct('<HHI'), get_struct('<HHI'))
+
+    def test_missing_file(self):
+        with self.assertRaises(FileNotFoundError):
+            BinaryParser(os.path.join(self.temp_dir.name, 'missing'))
+
+class TestRecordSchema(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.binary_path = os.path.join(self.temp_dir.name, 'records')
+        self.schema = RecordSchema([('id', 'I'), ('value', 'd'), ('flags', 'H'), (None, '2x'), ('tag', '4s')])
+        with open(self.binary_path, 'wb') as f:
+            f.write(b"HEAD")
+            for index in range(1000):
+                f.write(self.schema.struct.pack(index, index / 2, index % 7, b"t%03d" % (index % 100)))
+            f.write(b"trailing")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def expected(self, start=0, stop=1000):
+        return [(index, index / 2, index % 7, b"t%03d" % (index % 100)) for index in range(start, stop)]
+
+    def test_schema_compiles_to_one_struct(self):
+        self.assertEqual(self.schema.struct.format, '<IdH2x4s')
+        self.assertEqual(self.schema.size, 20)
+        self.assertEqual(self.schema.names, ('id', 'value', 'flags', 'tag'))
+        self.assertEqual(self.schema.offsets, [0, 4, 12, 16])
+        with self.assertRaises(ValueError):
+            RecordSchema([('pair', '2I')])
+
+    def test_iter_records_in_both_modes(self):
+        with patch.object(BinaryParser, 'ITER_CHUNK_SIZE', 64):
+            records = list(BinaryParser(self.binary_path).iter_records(self.schema, offset=4))
+        self.assertEqual(records, self.expected())
+        with BinaryParser(self.binary_path, use_mmap=True) as parser:
+            records = list(parser.iter_records(self.schema, offset=4 + 20 * 10, count=5, named=True))
+            self.assertEqual(records, self.expected(10, 15))
+            self.assertEqual(records[0].value, 5.0)
+            with self.assertRaises(ValueError):
+                parser.iter_records(self.schema, offset=4, count=1001)
+
+    @unittest.skipUnless(HAS_NUMPY, "NumPy is not installed")
+    def test_read_array(self):
+        for use_mmap in (False, True):
+            parser = BinaryParser(self.binary_path, use_mmap=use_mmap)
+            array = parser.read_array(self.schema, offset=4)
+            self.assertEqual(len(array), 1000)
+            self.assertEqual(array['id'].sum(), sum(range(1000)))
+            self.assertEqual(array[999].tolist(), self.expected(999)[0])
+            del array
+            parser.close()
+
+    def test_read_array_without_numpy(self):
+        with patch.dict(sys.modules, {'numpy': None}):
+            with self.assertRaises(ImportError):
+                BinaryParser(self.binary_path).read_array(self.schema)
+
+class TestParallelParsing(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.binary_path = os.path.join(self.temp_dir.name, 'capture')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_fixed_size_records_merge_and_reduce_in_order(self):
+        schema = RecordSchema([('id', 'I'), ('value', 'd')])
+        with open(self.binary_path, 'wb') as f:
+            f.write(b"HEAD" + b"".join(schema.struct.pack(index, index / 4) for index in range(5003)) + b"xyz")
+        parser = BinaryParser(self.binary_path)
+        records = parser.parse_parallel(schema, offset=4, processes=2, chunk_size=1000)
+        self.assertEqual(records, [(index, index / 4) for index in range(5003)])
+        chunks = parser.parse_parallel(schema, sum_ids, offset=4, processes=2, chunk_size=12 * 1000)
+        self.assertEqual(len(chunks), 6)
+        self.assertEqual(chunks[0], sum(range(1000)))
+        self.assertEqual(parser.parse_parallel(schema, sum_ids, add, 0, offset=4, processes=2, chunk_size=1000),
+                         sum(range(5003)))
+
+    def test_delimited_records_resync_across_ranges_and_corruption(self):
+        layout = DelimitedFormat(b"\xa5\x5a")
+        payloads = [b"record %d " % index * (index % 9) for index in range(2000)]
+        data = b"".join(layout.encode(payload) for payload in payloads)
+        # Corrupt the marker of one record in the middle. The record before it is not followed by a valid
+        # header any more, so both are skipped, the same way by every reader.
+        corrupt = data.index(layout.encode(payloads[1000]))
+        with open(self.binary_path, 'wb') as f:
+            f.write(data[:corrupt] + b"\x00" + data[corrupt + 1:])
+        expected = payloads[:999] + payloads[1001:]
+        parser = BinaryParser(self.binary_path)
+        with patch('builtins.print'):
+            self.assertEqual(list(parser.iter_delimited(layout)), expected)
+            for chunk_size in (64, 4096):
+                self.assertEqual(parser.parse_parallel(layout, processes=2, chunk_size=chunk_size), expected)
+
+class TestParseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.binary_path = os.path.join(self.temp_dir.name, 'binary')
+        self.write(7, b"first")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write(self, header, name, mtime_ns=None):
+        with open(self.binary_path, 'wb') as f:
+            f.write(struct.pack('I', header) + struct.pack('d', 1.5) + name.ljust(16, b"\x00"))
+        if mtime_ns is not None:
+            os.utime(self.binary_path, ns=(mtime_ns, mtime_ns))
+
+    def test_hits_skip_file_io_and_change_invalidates(self):
+        cache = ParseCache()
+        parser = BinaryParser(self.binary_path, cache=cache)
+        self.assertEqual(parser.parse()['header'], 7)
+        with patch.object(BinaryParser, '_parse', side_effect=AssertionError("the file was parsed")):
+            parsed = parser.parse()
+            parsed['header'] = 0
+            self.assertEqual(parser.parse()['header'], 7)
+            self.assertEqual(cache.get_stats()['hits'], 2)
+        self.assertEqual(parser.parse_section(4, 8, 'd'), (1.5,))
+        with self.assertRaises(struct.error):
+            parser.parse_section(4, 4, 'd')
+        self.write(8, b"second", mtime_ns=10 ** 18)
+        self.assertEqual(parser.parse(), {'header': 8, 'value': 1.5, 'name': 'second'})
+        self.assertEqual(cache.get_stats()['invalidations'], 2)
+        self.assertEqual(cache.get_stats()['entries'], 1)
+
+    def test_keys_follow_the_mapped_file_when_the_path_is_replaced(self):
+        cache = ParseCache()
+        with BinaryParser(self.binary_path, use_mmap=True, cache=cache) as mapped:
+            self.assertEqual(mapped.parse()['header'], 7)
+            replacement_path = os.path.join(self.temp_dir.name, 'replacement')
+            with open(replacement_path, 'wb') as f:
+                f.write(struct.pack('I', 8) + struct.pack('d', 1.5) + b"second".ljust(16, b"\x00"))
+            os.replace(replacement_path, self.binary_path)
+            self.assertEqual(BinaryParser(self.binary_path, cache=cache).parse()['header'], 8)
+            with BinaryParser(self.binary_path, use_mmap=True, cache=cache) as remapped:
+                self.assertEqual(remapped.parse()['header'], 8)
+                self.assertEqual(remapped.parse_section(0, 4, 'I'), (8,))
+            self.assertEqual(mapped.parse()['header'], 7)
+            self.assertEqual(mapped.parse_section(0, 4, 'I'), (7,))
+        self.assertEqual(BinaryParser(self.binary_path, cache=cache).parse()['name'], 'second')
+
+    def test_byte_budget_evicts_least_recently_used(self):
+        probe = ParseCache()
+        BinaryParser(self.binary_path, cache=probe).parse_section(0, 4, 'I')
+        entry_size = probe.get_size()
+        cache = ParseCache(max_bytes=entry_size * 3)
+        parser = BinaryParser(self.binary_path, cache=cache)
+        for offset in range(3):
+            parser.parse_section(offset, 4, 'I')
+        parser.parse_section(0, 4, 'I')
+        parser.parse_section(3, 4, 'I')
+        self.assertEqual(cache.get_stats()['evictions'], 1)
+        self.assertLessEqual(cache.get_size(), entry_size * 3)
+        keys = [key[4] for key in cache.entries]
+        self.assertEqual(keys, [2, 0, 3])
+
+    def test_persists_across_restarts(self):
+        cache_path = os.path.join(self.temp_dir.name, 'parse.cache')
+        with ParseCache(path=cache_path) as cache:
+            BinaryParser(self.binary_path, cache=cache).parse()
+        restored = ParseCache(path=cache_path)
+        with patch.object(BinaryParser, '_parse', side_effect=AssertionError("the file was parsed")):
+            self.assertEqual(BinaryParser(self.binary_path, cache=restored).parse()['name'], 'first')
+        self.write(9, b"changed", mtime_ns=10 ** 18)
+        self.assertEqual(BinaryParser(self.binary_path, cache=restored).parse()['header'], 9)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import unittest
+from brent.network.pool import AsyncConnectionPool, ConnectionPool
+from brent.network.protocols.custom_protocol import CustomProtocolServer
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def echo_request(client):
+    client.send_message("ping")
+    return client.receive_message()
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.server = CustomProtocolServer('127.0.0.1', 0, lambda message: message)
+        self.server.listen()
+        self.port = self.server.port
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join(5)
+        self.server.close()
+
+    def test_reuses_connections_and_limits_size(self):
+        with ConnectionPool(max_size=2) as pool:
+            first = pool.acquire('127.0.0.1', self.port)
+            second = pool.acquire('127.0.0.1', self.port)
+            with self.assertRaises(TimeoutError):
+                pool.acquire('127.0.0.1', self.port, timeout=0.05)
+            pool.release(first)
+            self.assertIs(pool.acquire('127.0.0.1', self.port), first)
+            pool.release(first)
+            pool.release(second)
+            for _ in range(10):
+                self.assertEqual(pool.call('127.0.0.1', self.port, echo_request), "ping")
+            self.assertEqual(pool.get_size('127.0.0.1', self.port), 2)
+
+    def test_evicts_idle_connections(self):
+        clock = FakeClock()
+        with ConnectionPool(idle_timeout=10, clock=clock) as pool:
+            pool.call('127.0.0.1', self.port, echo_request)
+            self.assertEqual(pool.get_idle_count('127.0.0.1', self.port), 1)
+            clock.now = 11
+            pool.evict_idle()
+            self.assertEqual(pool.get_idle_count('127.0.0.1', self.port), 0)
+            self.assertEqual(pool.get_size('127.0.0.1', self.port), 0)
+
+    def test_health_check_and_reconnect_replace_dead_connections(self):
+        with ConnectionPool() as pool:
+            client = pool.acquire('127.0.0.1', self.port)
+            pool.release(client)
+            # Simulate the server dropping the idle connection.
+            client.socket.close()
+            self.assertIsNot(pool.acquire('127.0.0.1', self.port), client)
+
+        calls = []
+
+        def flaky(client):
+            calls.append(client)
+            if len(calls) == 1:
+                raise BrokenPipeError("broken")
+            return echo_request(client)
+
+        with ConnectionPool() as pool:
+            self.assertEqual(pool.call('127.0.0.1', self.port, flaky), "ping")
+            self.assertIsNot(calls[0], calls[1])
+            self.assertEqual(pool.get_size('127.0.0.1', self.port), 1)
+
+    def test_async_pool_reuses_connections(self):
+        async def run():
+            async with AsyncConnectionPool(max_size=2) as pool:
+                results = await asyncio.gather(*(pool.call('127.0.0.1', self.port, lambda client: client.request("hi"))
+                                                 for _ in range(20)))
+                self.assertEqual(results, ["hi"] * 20)
+                self.assertEqual(pool.get_size('127.0.0.1', self.port), 2)
+                self.assertEqual(pool.get_idle_count('127.0.0.1', self.port), 2)
+
+        asyncio.run(run())
+
+if __name__ == '__main__':
+    unittest.main()
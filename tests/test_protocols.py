@@ -0,0 +1,431 @@
+import asyncio
+import json
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+import unittest
+from brent.network.protocols.async_custom_protocol import AsyncCustomProtocol
+from brent.network.protocols.custom_protocol import (CustomProtocol, CustomProtocolServer, FrameCodec,
+                                                     MultiplexedCustomProtocol)
+from brent.network.protocols.http import SimpleHTTPClient
+
+def tagged_upper(message):
+    return f"{os.getpid()}:{message.upper()}"
+
+class TestAsyncCustomProtocol(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.server = await asyncio.start_server(self._echo, '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _echo(self, reader, writer):
+        try:
+            while True:
+                header = await reader.readexactly(4)
+                message = await reader.readexactly(struct.unpack('!I', header)[0])
+                if message == b"close":
+                    break
+                writer.write(header + message.upper())
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            writer.close()
+
+    async def test_pipelined_responses_arrive_in_order(self):
+        async with AsyncCustomProtocol('127.0.0.1', self.port) as client:
+            futures = [client.send_message(f"message {i}") for i in range(500)]
+            await client.drain()
+            responses = await asyncio.gather(*futures)
+            self.assertEqual(responses, [f"MESSAGE {i}" for i in range(500)])
+            self.assertEqual(await client.request("ping"), "PING")
+
+    async def test_many_concurrent_connections(self):
+        clients = [AsyncCustomProtocol('127.0.0.1', self.port) for _ in range(50)]
+        await asyncio.gather(*(client.connect() for client in clients))
+        responses = await asyncio.gather(*(client.request(f"client {i}") for i, client in enumerate(clients)))
+        self.assertEqual(responses, [f"CLIENT {i}" for i in range(50)])
+        await asyncio.gather(*(client.close() for client in clients))
+
+    async def test_pending_requests_fail_when_server_closes(self):
+        async with AsyncCustomProtocol('127.0.0.1', self.port) as client:
+            pending = client.send_message("close")
+            with self.assertRaises(ConnectionError):
+                await asyncio.wait_for(pending, 5)
+            with self.assertRaises(ConnectionError):
+                client.send_message("late")
+
+class TestCustomProtocolServer(unittest.TestCase):
+
+    def setUp(self):
+        self.server = None
+        self.thread = None
+
+    def tearDown(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.thread.join(5)
+            self.server.close()
+
+    def _start(self, handler, **kwargs):
+        self.server = CustomProtocolServer('127.0.0.1', 0, handler, **kwargs)
+        self.server.listen()
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def test_decodes_split_and_coalesced_frames(self):
+        self._start(lambda message: message.upper())
+        frames = b"".join(struct.pack('!I', len(m)) + m for m in (b"one", b"two", b"three"))
+        with socket.create_connection(('127.0.0.1', self.server.port)) as sock:
+            # Byte-at-a-time and three-frames-at-once must both be decoded.
+            for index in range(len(frames) // 2):
+                sock.sendall(frames[index:index + 1])
+            sock.sendall(frames[len(frames) // 2:])
+            client = CustomProtocol('127.0.0.1', self.server.port)
+            client.socket = sock
+            self.assertEqual([client.receive_message() for _ in range(3)], ["ONE", "TWO", "THREE"])
+
+    def test_many_connections_and_silent_handler(self):
+        received = []
+        self._start(lambda message: None if message == "quiet" else received.append(message) or "ok")
+        clients = [CustomProtocol('127.0.0.1', self.server.port) for _ in range(100)]
+        for client in clients:
+            client.connect()
+        for index, client in enumerate(clients):
+            client.send_message("quiet")
+            client.send_message(f"client {index}")
+        self.assertEqual([client.receive_message() for client in clients], ["ok"] * 100)
+        self.assertEqual(sorted(received), sorted(f"client {index}" for index in range(100)))
+        self.assertEqual(self.server.get_connection_count(), 100)
+        for client in clients:
+            client.close()
+
+    def test_compressed_requests_and_responses(self):
+        self._start(lambda message: message * 100, compression='zlib', compression_threshold=256)
+        client = CustomProtocol('127.0.0.1', self.server.port, compression='lzma', compression_threshold=16)
+        client.connect()
+        for _ in range(3):
+            client.send_message("abc" * 10)
+            self.assertEqual(client.receive_message(), "abc" * 1000)
+        client.close()
+
+    def test_oversized_message_closes_connection(self):
+        self._start(lambda message: message, max_message_size=8)
+        client = CustomProtocol('127.0.0.1', self.server.port)
+        client.connect()
+        client.send_message("far too long for the limit")
+        self.assertIsNone(client.receive_message())
+        client.close()
+
+    @unittest.skipUnless(hasattr(socket, 'SO_REUSEPORT'), "SO_REUSEPORT is not available")
+    def test_reuse_port_spreads_connections_over_processes(self):
+        self.server = CustomProtocolServer('127.0.0.1', 0, tagged_upper, reuse_port=True)
+        self.server.listen()
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(2,))
+        self.thread.start()
+        pids = set()
+        deadline = time.monotonic() + 10
+        # The second process binds the port shortly after starting, so keep connecting until it answers.
+        while len(pids) < 2 and time.monotonic() < deadline:
+            client = CustomProtocol('127.0.0.1', self.server.port)
+            client.connect()
+            client.send_message("hi")
+            pid, reply = client.receive_message().split(":")
+            self.assertEqual(reply, "HI")
+            pids.add(pid)
+            client.close()
+        self.assertEqual(len(pids), 2)
+
+    def test_multiplexed_threads_share_one_connection(self):
+        self._start(lambda message: message.upper(), multiplexed=True, compression='zlib')
+        client = MultiplexedCustomProtocol('127.0.0.1', self.server.port, compression='zlib', compression_threshold=16)
+        client.connect()
+        results = {}
+
+        def worker(index):
+            results[index] = [client.request(f"thread {index} message {i}" * 4, timeout=5) for i in range(50)]
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for index in range(8):
+            self.assertEqual(results[index], [f"THREAD {index} MESSAGE {i}" * 4 for i in range(50)])
+        self.assertEqual(self.server.get_connection_count(), 1)
+        self.assertEqual(client.get_pending_count(), 0)
+        client.close()
+
+    def test_slow_request_does_not_block_others(self):
+        release = threading.Event()
+
+        def handler(message):
+            if message == "slow":
+                release.wait(5)
+            return message.upper()
+
+        self._start(handler, multiplexed=True, handler_threads=4)
+        client = MultiplexedCustomProtocol('127.0.0.1', self.server.port)
+        client.connect()
+        slow = client.submit("slow")
+        # The fast requests are answered while the slow one is still running.
+        self.assertEqual([client.request(f"fast {i}", timeout=5) for i in range(10)],
+                         [f"FAST {i}" for i in range(10)])
+        self.assertFalse(slow.done())
+        release.set()
+        self.assertEqual(slow.result(5), "SLOW")
+        client.close()
+
+    def test_multiplexed_pending_requests_fail_on_close(self):
+        release = threading.Event()
+        self._start(lambda message: release.wait(5) and message, multiplexed=True, handler_threads=1)
+        client = MultiplexedCustomProtocol('127.0.0.1', self.server.port)
+        client.connect()
+        pending = client.submit("never answered")
+        client.close()
+        release.set()
+        with self.assertRaises(ConnectionError):
+            pending.result(5)
+        with self.assertRaises(ConnectionError):
+            client.submit("late")
+
+    def test_invalid_utf8_with_handler_threads_closes_only_that_connection(self):
+        self._start(lambda message: message.upper(), multiplexed=True, handler_threads=2)
+        client = MultiplexedCustomProtocol('127.0.0.1', self.server.port)
+        client.connect()
+        bad = MultiplexedCustomProtocol('127.0.0.1', self.server.port)
+        bad.connect()
+        pending = bad.submit(b"\xff\xfe not utf-8")
+        with self.assertRaises(ConnectionError):
+            pending.result(5)
+        self.assertEqual(client.request("still served", timeout=5), "STILL SERVED")
+        self.assertTrue(self.thread.is_alive())
+        bad.close()
+        client.close()
+
+    def test_handler_threads_require_multiplexing(self):
+        with self.assertRaises(ValueError):
+            CustomProtocolServer('127.0.0.1', 0, str.upper, handler_threads=2)
+
+class TestCustomProtocol(unittest.TestCase):
+
+    def _pair(self, **kwargs):
+        left, right = socket.socketpair()
+        sender = CustomProtocol(None, None)
+        sender.socket = left
+        receiver = CustomProtocol(None, None, **kwargs)
+        receiver.socket = right
+        self.addCleanup(sender.close)
+        self.addCleanup(receiver.close)
+        return sender, receiver
+
+    def test_raw_frames_round_trip_through_reused_buffer(self):
+        sender, receiver = self._pair(reuse_buffer=True, buffer_size=16)
+        large = bytes(range(256)) * 4096
+        writer = threading.Thread(target=lambda: [sender.send_bytes(payload) for payload in (b"\xff\x00", large, b"")])
+        writer.start()
+        first = receiver.receive_bytes()
+        self.assertIsInstance(first, memoryview)
+        self.assertEqual(bytes(first), b"\xff\x00")
+        self.assertEqual(bytes(receiver.receive_bytes()), large)
+        self.assertGreaterEqual(len(receiver.receive_buffer), len(large))
+        self.assertEqual(bytes(receiver.receive_bytes()), b"")
+        writer.join()
+        sender.send_message("caf\u00e9")
+        self.assertEqual(receiver.receive_message(), "caf\u00e9")
+        sender.close()
+        self.assertIsNone(receiver.receive_bytes())
+
+    def test_batched_frames_coalesce_writes_and_decode_together(self):
+        sender, receiver = self._pair()
+        writes = []
+        real_socket = sender.socket
+
+        class CountingSocket:
+            def sendall(self, data):
+                writes.append(len(data))
+                real_socket.sendall(data)
+
+            def close(self):
+                real_socket.close()
+
+        sender.socket = CountingSocket()
+        messages = [f"reading {i}" for i in range(1000)]
+        self.assertEqual(sender.send_messages(messages, flush_size=4096), 1000)
+        self.assertTrue(all(size >= 4096 for size in writes[:-1]))
+        self.assertLess(len(writes), 10)
+        received = []
+        while len(received) < 1000:
+            received.extend(receiver.receive_messages())
+        self.assertEqual(received, messages)
+
+        sender.send_messages(["slow"] * 3, flush_interval=0)
+        self.assertEqual(writes[-3:], [8, 8, 8])
+        self.assertEqual(receiver.receive_messages(raw=True)[:1], [b"slow"])
+
+    def test_compressed_frames_shrink_and_round_trip(self):
+        document = json.dumps([{"host": f"node-{i % 8}", "status": "ok", "latency_ms": i % 50} for i in range(2000)])
+        for compression in ('zlib', 'lzma'):
+            sender, receiver = self._pair(compression='none')
+            sender.codec = FrameCodec(compression, threshold=64)
+            header, payload = FrameCodec(compression, threshold=64).encode(document.encode())
+            self.assertEqual(len(header), 5)
+            self.assertLess(len(payload), len(document) // 5)
+            sender.send_messages(["small", document, document])
+            self.assertEqual(receiver.receive_message(), "small")
+            self.assertEqual(receiver.receive_messages(), [document, document])
+        # The streaming zlib context makes a repeat within its 32 KB window much cheaper the second time.
+        codec = FrameCodec('zlib', threshold=0)
+        first = codec.encode(document[:8000].encode())[1]
+        second = codec.encode(document[:8000].encode())[1]
+        self.assertLess(len(second), len(first) // 4)
+
+    def test_partial_frame_is_kept_for_the_next_receive(self):
+        sender, receiver = self._pair()
+        frames = b"\x00\x00\x00\x03one\x00\x00\x00\x03two"
+        sender.socket.sendall(frames[:10])
+        self.assertEqual(receiver.receive_messages(), ["one"])
+        sender.socket.sendall(frames[10:])
+        self.assertEqual(receiver.receive_message(), "two")
+
+class ScriptedHTTPServer:
+    """
+    Answers each request on a connection with the next canned response and counts connections.
+    """
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.connections = 0
+        self.listener = socket.create_server(('127.0.0.1', 0))
+        self.port = self.listener.getsockname()[1]
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        while self.responses:
+            try:
+                sock, _ = self.listener.accept()
+            except OSError:
+                return
+            self.connections += 1
+            with sock:
+                data = b""
+                while self.responses:
+                    while b"\r\n\r\n" not in data:
+                        chunk = sock.recv(4096)
+                        if not chunk:
+                            break
+                        data += chunk
+                    if b"\r\n\r\n" not in data:
+                        break
+                    request, data = data.split(b"\r\n\r\n", 1)
+                    self.requests.append(request.split(b"\r\n")[0].decode())
+                    response = self.responses.pop(0)
+                    sock.sendall(response)
+                    if b"Connection: close" in response:
+                        break
+
+    def close(self):
+        self.listener.close()
+
+class TestSimpleHTTPClient(unittest.TestCase):
+
+    def test_keep_alive_with_content_length_and_chunked_bodies(self):
+        server = ScriptedHTTPServer([
+            b"HTTP/1.1 200 OK\r\nContent-Length: 5\r\n\r\nhello",
+            b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n3\r\nabc\r\n4;ext=1\r\ndefg\r\n0\r\nX-Trailer: 1\r\n\r\n",
+            b"HTTP/1.1 204 No Content\r\n\r\n",
+        ])
+        client = SimpleHTTPClient(f"http://127.0.0.1:{server.port}/first")
+        client.connect()
+        try:
+            client.send_request()
+            self.assertEqual(client.receive_response(), "HTTP/1.1 200 OK\r\nContent-Length: 5\r\n\r\nhello")
+            response = client.request("GET", "/second")
+            self.assertEqual((response.status, response.body), (200, b"abcdefg"))
+            response = client.request("DELETE", "/third")
+            self.assertEqual((response.status, response.reason, response.body), (204, "No Content", b""))
+        finally:
+            client.close()
+            server.close()
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(server.requests, ["GET /first HTTP/1.1", "GET /second HTTP/1.1", "DELETE /third HTTP/1.1"])
+
+    def test_pipelined_requests_and_reconnect_after_close(self):
+        server = ScriptedHTTPServer([
+            b"HTTP/1.1 200 OK\r\nContent-Length: 1\r\n\r\na",
+            b"HTTP/1.1 200 OK\r\nContent-Length: 1\r\nConnection: close\r\n\r\nb",
+            b"HTTP/1.1 200 OK\r\nContent-Length: 1\r\n\r\nc",
+        ])
+        client = SimpleHTTPClient(f"http://127.0.0.1:{server.port}/")
+        client.connect()
+        try:
+            client.send_request(path="/a")
+            client.send_request(path="/b")
+            self.assertEqual(client.read_response().body, b"a")
+            second = client.read_response()
+            self.assertEqual(second.body, b"b")
+            self.assertTrue(second.will_close)
+            response = client.request(path="/c")
+            with tempfile.TemporaryFile() as file:
+                self.assertEqual(response.write_to(file.fileno()), 1)
+                file.seek(0)
+                self.assertEqual(file.read(), b"c")
+        finally:
+            client.close()
+            server.close()
+        self.assertEqual(server.connections, 2)
+
+    def test_streams_large_binary_bodies_in_bounded_chunks(self):
+        body = bytes(range(256)) * 8192
+        chunked = b"".join(b"%x\r\n%s\r\n" % (len(body[i:i + 100000]), body[i:i + 100000])
+                           for i in range(0, len(body), 100000)) + b"0\r\n\r\n"
+        server = ScriptedHTTPServer([
+            b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body),
+            b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n" + chunked,
+            b"HTTP/1.1 200 OK\r\nContent-Length: 10\r\n\r\n0123456789",
+            b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok",
+        ])
+        client = SimpleHTTPClient(f"http://127.0.0.1:{server.port}/")
+        client.connect()
+        try:
+            client.send_request()
+            response = client.stream_response()
+            self.assertIsNone(response.body)
+            sizes = []
+            received = bytearray()
+            for chunk in response.iter_chunks():
+                sizes.append(len(chunk))
+                received += chunk
+            self.assertEqual(bytes(received), body)
+            self.assertLessEqual(max(sizes), SimpleHTTPClient.RECV_SIZE)
+
+            client.send_request()
+            with tempfile.TemporaryFile() as file:
+                self.assertEqual(client.stream_response().write_to(file.fileno()), len(body))
+                file.seek(0)
+                self.assertEqual(file.read(), body)
+
+            # An unread body is skipped when the next response is read.
+            client.send_request()
+            client.send_request()
+            client.stream_response()
+            response = client.read_response()
+            self.assertEqual(response.body, b"ok")
+            with tempfile.TemporaryFile() as file:
+                self.assertEqual(response.write_to(file), 2)
+                file.seek(0)
+                self.assertEqual(file.read(), b"ok")
+            self.assertEqual(list(response.iter_chunks()), [b"ok"])
+        finally:
+            client.close()
+            server.close()
+
+if __name__ == '__main__':
+    unittest.main()
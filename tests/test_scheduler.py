@@ -44,3 +44,535 @@
 
 # if __name__ == '__main__':
 #     unittest.main()
+
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+from brent.network.async_scheduler import AsyncNetworkTaskScheduler
+from brent.network.metrics import Histogram
+from brent.network.priority_queue import IndexedPriorityQueue
+from brent.network.scheduler import (DependencyError, NetworkTask, NetworkTaskScheduler, QueueFullError,
+                                     TaskExpiredError)
+from brent.network.sharded_scheduler import ShardedNetworkTaskScheduler
+from brent.network.timer_wheel import TimerWheel
+
+def write_pid(path):
+    with open(path, 'w') as file:
+        file.write(str(os.getpid()))
+
+class TestNetworkTaskScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = None
+
+    def tearDown(self):
+        if self.scheduler is not None:
+            self.scheduler.stop()
+
+    def test_runs_tasks_in_priority_order(self):
+        self.scheduler = NetworkTaskScheduler()
+        gate = threading.Event()
+        done = threading.Event()
+        order = []
+        self.scheduler.add_task(0, "gate", gate.wait)
+        self.scheduler.add_task(2, "low", order.append, "low")
+        self.scheduler.add_task(1, "high", order.append, "high")
+        self.scheduler.add_task(3, "done", done.set)
+        gate.set()
+        self.assertTrue(done.wait(5))
+        self.assertEqual(order, ["high", "low"])
+
+    def test_worker_pool_runs_tasks_concurrently(self):
+        self.scheduler = NetworkTaskScheduler(num_workers=4)
+        barrier = threading.Barrier(4, timeout=5)
+        for index in range(4):
+            self.scheduler.add_task(0, f"task{index}", barrier.wait)
+        # Each task only returns once all four are running at the same time.
+        barrier_done = threading.Event()
+        self.scheduler.add_task(1, "done", barrier_done.set)
+        self.assertTrue(barrier_done.wait(5))
+        self.assertFalse(barrier.broken)
+
+    def test_failing_task_does_not_kill_worker(self):
+        self.scheduler = NetworkTaskScheduler()
+        done = threading.Event()
+        self.scheduler.add_task(0, "fail", lambda: 1 / 0)
+        self.scheduler.add_task(1, "done", done.set)
+        self.assertTrue(done.wait(5))
+
+    def test_delayed_task_runs_after_delay(self):
+        self.scheduler = NetworkTaskScheduler()
+        done = threading.Event()
+        started = time.monotonic()
+        self.scheduler.add_task(0, "delayed", done.set, delay=0.1)
+        self.assertEqual(self.scheduler.get_scheduled_count(), 1)
+        self.assertTrue(done.wait(5))
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+
+    def test_periodic_task_repeats(self):
+        self.scheduler = NetworkTaskScheduler()
+        runs = []
+        enough = threading.Event()
+
+        def heartbeat():
+            runs.append(time.monotonic())
+            if len(runs) == 3:
+                enough.set()
+
+        self.scheduler.add_task(0, "heartbeat", heartbeat, every=0.05)
+        self.assertTrue(enough.wait(5))
+        self.assertGreaterEqual(runs[2] - runs[0], 0.09)
+
+    def test_run_at_and_delay_are_exclusive(self):
+        self.scheduler = NetworkTaskScheduler()
+        with self.assertRaises(ValueError):
+            self.scheduler.add_task(0, "task", print, run_at=time.monotonic(), delay=1)
+
+    def _block_worker(self):
+        gate = threading.Event()
+        started = threading.Event()
+
+        def wait_for_gate():
+            started.set()
+            gate.wait()
+
+        self.scheduler.add_task(-1, "gate", wait_for_gate)
+        started.wait(5)
+        return gate
+
+    def _run_until_done(self, gate):
+        done = threading.Event()
+        self.scheduler.add_task(100, "done", done.set)
+        gate.set()
+        self.assertTrue(done.wait(5))
+
+    def test_cancel_and_update_priority(self):
+        self.scheduler = NetworkTaskScheduler()
+        gate = self._block_worker()
+        order = []
+        self.scheduler.add_task(1, "a", order.append, "a")
+        self.scheduler.add_task(2, "b", order.append, "b")
+        self.scheduler.add_task(3, "c", order.append, "c")
+        self.assertTrue(self.scheduler.cancel("a"))
+        self.assertFalse(self.scheduler.cancel("missing"))
+        self.assertTrue(self.scheduler.update_priority("c", 0))
+        self.assertEqual(self.scheduler.get_task_count(), 2)
+        self._run_until_done(gate)
+        self.assertEqual(order, ["c", "b"])
+
+    def test_cancel_scheduled_task(self):
+        self.scheduler = NetworkTaskScheduler()
+        self.scheduler.add_task(0, "later", print, delay=60)
+        self.assertTrue(self.scheduler.cancel("later"))
+        self.assertEqual(self.scheduler.get_scheduled_count(), 0)
+
+    def test_duplicates_are_coalesced(self):
+        self.scheduler = NetworkTaskScheduler()
+        gate = self._block_worker()
+        runs = []
+        for _ in range(5):
+            self.scheduler.add_task(5, "probe", runs.append, "probe")
+        self.scheduler.add_task(0, "probe", runs.append, "probe")
+        self.scheduler.add_task(1, "other", runs.append, "other")
+        self.assertEqual(self.scheduler.get_task_count(), 2)
+        self._run_until_done(gate)
+        self.assertEqual(runs, ["probe", "other"])
+
+    def test_coalesce_keeps_earlier_run_at(self):
+        self.scheduler = NetworkTaskScheduler()
+        done = threading.Event()
+        self.assertTrue(self.scheduler.add_task(0, "probe", done.set, delay=60).added)
+        self.assertFalse(self.scheduler.add_task(0, "probe", done.set).added)
+        self.assertTrue(done.wait(5))
+
+    def test_coalesce_rejects_conflicting_period(self):
+        self.scheduler = NetworkTaskScheduler()
+        self.scheduler.add_task(0, "probe", print, delay=60)
+        with self.assertRaises(ValueError):
+            self.scheduler.add_task(0, "probe", print, every=0.1)
+        self.assertTrue(self.scheduler.add_task(0, "heartbeat", print, delay=60, every=1).added)
+        self.assertFalse(self.scheduler.add_task(0, "heartbeat", print, delay=60).added)
+        with self.assertRaises(ValueError):
+            self.scheduler.add_task(0, "heartbeat", print, every=2)
+
+    def test_duplicate_policies(self):
+        self.scheduler = NetworkTaskScheduler(duplicate_policy='reject')
+        gate = self._block_worker()
+        self.scheduler.add_task(0, "probe", print)
+        with self.assertRaises(ValueError):
+            self.scheduler.add_task(0, "probe", print)
+        gate.set()
+        self.scheduler.stop()
+
+        self.scheduler = NetworkTaskScheduler(duplicate_policy='replace')
+        gate = self._block_worker()
+        runs = []
+        self.scheduler.add_task(0, "probe", runs.append, "old")
+        self.scheduler.add_task(0, "probe", runs.append, "new")
+        self._run_until_done(gate)
+        self.assertEqual(runs, ["new"])
+
+    def test_bounded_queue_rejects(self):
+        self.scheduler = NetworkTaskScheduler(max_queue_size=2, overflow_policy='reject')
+        gate = self._block_worker()
+        self.scheduler.add_task(0, "a", print)
+        self.scheduler.add_task(0, "b", print)
+        with self.assertRaises(QueueFullError):
+            self.scheduler.add_task(0, "c", print)
+        self.assertEqual(self.scheduler.get_counters()['rejected'], 1)
+        gate.set()
+
+    def test_bounded_queue_drops_lowest_priority(self):
+        self.scheduler = NetworkTaskScheduler(max_queue_size=2, overflow_policy='drop_lowest')
+        gate = self._block_worker()
+        runs = []
+        self.scheduler.add_task(1, "a", runs.append, "a")
+        self.scheduler.add_task(5, "b", runs.append, "b")
+        self.assertTrue(self.scheduler.add_task(2, "c", runs.append, "c").added)
+        self.assertFalse(self.scheduler.add_task(9, "d", runs.append, "d").added)
+        self.assertEqual(self.scheduler.get_counters()['dropped'], 2)
+        self.scheduler.cancel("a")
+        self._run_until_done(gate)
+        self.assertEqual(runs, ["c"])
+
+    def test_bounded_queue_blocks_until_space(self):
+        self.scheduler = NetworkTaskScheduler(max_queue_size=1)
+        gate = self._block_worker()
+        self.scheduler.add_task(0, "a", print)
+        added = threading.Event()
+
+        def producer():
+            self.scheduler.add_task(0, "b", print)
+            added.set()
+
+        thread = threading.Thread(target=producer)
+        thread.start()
+        self.assertFalse(added.wait(0.1))
+        gate.set()
+        self.assertTrue(added.wait(5))
+        thread.join()
+
+    def test_rate_limit_defers_tasks(self):
+        self.scheduler = NetworkTaskScheduler()
+        self.scheduler.set_rate_limit("backend", rate=20, burst=1)
+        runs = []
+        done = threading.Event()
+
+        def record():
+            runs.append(time.monotonic())
+            if len(runs) == 3:
+                done.set()
+
+        for index in range(3):
+            self.scheduler.add_task(0, f"task{index}", record, task_class="backend")
+        self.assertTrue(done.wait(5))
+        self.assertGreaterEqual(runs[2] - runs[0], 0.09)
+        self.assertGreaterEqual(self.scheduler.get_counters()['rate_limited'], 2)
+
+    def test_process_backend_runs_in_pool(self):
+        self.scheduler = NetworkTaskScheduler(process_workers=2, process_chunk_size=4)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = [os.path.join(temp_dir, f"task{index}") for index in range(6)]
+            gate = self._block_worker()
+            for index, path in enumerate(paths):
+                self.scheduler.add_task(0, f"task{index}", write_pid, path, backend='process')
+            gate.set()
+            deadline = time.monotonic() + 10
+            while not all(os.path.exists(path) for path in paths) and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.scheduler.stop()
+            self.scheduler = None
+            pids = set()
+            for path in paths:
+                with open(path) as file:
+                    pids.add(int(file.read()))
+        self.assertNotIn(os.getpid(), pids)
+
+    def test_process_backend_requires_pool(self):
+        self.scheduler = NetworkTaskScheduler()
+        with self.assertRaises(ValueError):
+            self.scheduler.add_task(0, "task", print, backend='process')
+
+    def test_add_task_returns_future(self):
+        self.scheduler = NetworkTaskScheduler()
+        self.assertEqual(self.scheduler.add_task(0, "sum", sum, [1, 2, 3]).result(5), 6)
+        with self.assertRaises(ZeroDivisionError):
+            self.scheduler.add_task(0, "fail", lambda: 1 / 0).result(5)
+
+    def test_cancel_cancels_future(self):
+        self.scheduler = NetworkTaskScheduler()
+        future = self.scheduler.add_task(0, "later", print, delay=60)
+        self.scheduler.cancel("later")
+        self.assertTrue(future.cancelled())
+
+    def test_dependencies_run_in_order(self):
+        self.scheduler = NetworkTaskScheduler(num_workers=4)
+        gate = threading.Event()
+        order = []
+
+        def step(name):
+            order.append(name)
+            return name
+
+        # Reversed priorities; only the dependencies order the tasks.
+        self.scheduler.add_task(2, "parse", gate.wait)
+        encrypt = self.scheduler.add_task(1, "encrypt", step, "encrypt", depends_on=["parse"])
+        send = self.scheduler.add_task(0, "send", step, "send", depends_on=["encrypt"])
+        self.assertFalse(encrypt.done())
+        gate.set()
+        self.assertEqual(send.result(5), "send")
+        self.assertEqual(order, ["encrypt", "send"])
+
+    def test_independent_branches_run_in_parallel(self):
+        self.scheduler = NetworkTaskScheduler(num_workers=2)
+        barrier = threading.Barrier(2, timeout=5)
+        self.scheduler.add_task(0, "left", barrier.wait)
+        self.scheduler.add_task(0, "right", barrier.wait)
+        join = self.scheduler.add_task(0, "join", lambda: "joined", depends_on=["left", "right"])
+        self.assertEqual(join.result(5), "joined")
+
+    def test_failed_dependency_fails_dependents(self):
+        self.scheduler = NetworkTaskScheduler()
+        gate = threading.Event()
+
+        def parse():
+            gate.wait()
+            raise ValueError("corrupt input")
+
+        self.scheduler.add_task(0, "parse", parse)
+        encrypt = self.scheduler.add_task(0, "encrypt", print, depends_on=["parse"])
+        send = self.scheduler.add_task(0, "send", print, depends_on=["encrypt"])
+        gate.set()
+        with self.assertRaises(DependencyError):
+            encrypt.result(5)
+        with self.assertRaises(DependencyError):
+            send.result(5)
+
+    def test_earliest_deadline_first_within_priority(self):
+        self.scheduler = NetworkTaskScheduler()
+        gate = self._block_worker()
+        order = []
+        now = time.monotonic()
+        self.scheduler.add_task(1, "none", order.append, "none")
+        self.scheduler.add_task(1, "late", order.append, "late", deadline=now + 20)
+        self.scheduler.add_task(1, "soon", order.append, "soon", deadline=now + 10)
+        self.scheduler.add_task(0, "urgent", order.append, "urgent")
+        self._run_until_done(gate)
+        self.assertEqual(order, ["urgent", "soon", "late", "none"])
+
+    def test_expired_task_is_not_run(self):
+        self.scheduler = NetworkTaskScheduler()
+        gate = self._block_worker()
+        runs = []
+        future = self.scheduler.add_task(0, "stale", runs.append, "stale", deadline=time.monotonic() + 0.05)
+        time.sleep(0.1)
+        self._run_until_done(gate)
+        with self.assertRaises(TaskExpiredError):
+            future.result(5)
+        self.assertEqual(runs, [])
+        self.assertEqual(self.scheduler.get_counters()['expired'], 1)
+
+    def test_timeout_frees_worker(self):
+        self.scheduler = NetworkTaskScheduler()
+        hang = threading.Event()
+        hung = self.scheduler.add_task(0, "hung", hang.wait, timeout=0.05)
+        after = self.scheduler.add_task(1, "after", lambda: "ran")
+        with self.assertRaises(TimeoutError):
+            hung.result(5)
+        self.assertEqual(after.result(5), "ran")
+        self.assertEqual(self.scheduler.get_counters()['timed_out'], 1)
+        hang.set()
+
+    def test_invalid_worker_count(self):
+        with self.assertRaises(ValueError):
+            NetworkTaskScheduler(num_workers=0)
+
+    def test_metrics_record_wait_run_and_throughput(self):
+        self.scheduler = NetworkTaskScheduler()
+        self.scheduler.add_task(1, "slow", time.sleep, 0.02).result(5)
+        with self.assertRaises(ZeroDivisionError):
+            self.scheduler.add_task(2, "fail", lambda: 1 / 0).result(5)
+        metrics = self.scheduler.get_metrics()
+        self.assertEqual(metrics['counters']['enqueued'], 2)
+        self.assertEqual(metrics['counters']['started'], 2)
+        self.assertEqual(metrics['counters']['completed'], 1)
+        self.assertEqual(metrics['counters']['failed'], 1)
+        self.assertEqual(sorted(metrics['wait_time']), [1, 2])
+        self.assertGreaterEqual(metrics['run_time'][1]['sum'], 0.02)
+        self.assertEqual(metrics['queue_depth']['count'], 2)
+        text = self.scheduler.metrics.to_text()
+        self.assertIn('brent_scheduler_completed_total 1', text)
+        self.assertIn('brent_scheduler_run_time_seconds_count{priority="1"} 1', text)
+
+class TestShardedNetworkTaskScheduler(unittest.TestCase):
+    def test_runs_tasks_from_many_producers(self):
+        scheduler = ShardedNetworkTaskScheduler(num_workers=4)
+        futures = []
+        futures_lock = threading.Lock()
+
+        def produce(producer):
+            for i in range(200):
+                future = scheduler.add_task(i % 3, f"{producer}-{i}", lambda value: value * 2, i)
+                with futures_lock:
+                    futures.append((i, future))
+
+        producers = [threading.Thread(target=produce, args=(p,)) for p in range(8)]
+        for producer in producers:
+            producer.start()
+        for producer in producers:
+            producer.join()
+        try:
+            for i, future in futures:
+                self.assertEqual(future.result(timeout=5), i * 2)
+        finally:
+            scheduler.stop()
+        self.assertEqual(len(futures), 1600)
+        self.assertEqual(scheduler.get_task_count(), 0)
+
+    def test_idle_worker_steals_from_busy_shard(self):
+        scheduler = ShardedNetworkTaskScheduler(num_workers=2)
+        gate = threading.Event()
+        started = threading.Event()
+
+        def block():
+            started.set()
+            gate.wait(5)
+
+        try:
+            # Both tasks land on this thread's shard; the second can only run if the other worker steals it.
+            scheduler.add_task(0, "block", block)
+            self.assertTrue(started.wait(5))
+            stolen = scheduler.add_task(0, "stolen", threading.get_ident)
+            self.assertNotEqual(stolen.result(timeout=5), None)
+            self.assertFalse(gate.is_set())
+        finally:
+            gate.set()
+            scheduler.stop()
+
+    def test_exception_is_set_on_future_and_stop_cancels_pending(self):
+        scheduler = ShardedNetworkTaskScheduler(num_workers=1)
+        gate = threading.Event()
+
+        def fail():
+            raise ValueError("boom")
+
+        try:
+            with self.assertRaises(ValueError):
+                scheduler.add_task(0, "fail", fail).result(timeout=5)
+            scheduler.add_task(0, "block", gate.wait, 5)
+            pending = scheduler.add_task(1, "pending", lambda: None)
+        finally:
+            gate.set()
+            scheduler.stop()
+        self.assertTrue(pending.cancelled() or pending.done())
+        with self.assertRaises(RuntimeError):
+            scheduler.add_task(0, "late", lambda: None)
+
+class TestHistogram(unittest.TestCase):
+    def test_buckets_and_quantiles(self):
+        histogram = Histogram(buckets=(1, 10, 100))
+        self.assertIsNone(histogram.quantile(0.5))
+        for value in (0.5, 5, 5, 50, 500):
+            histogram.observe(value)
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot['count'], 5)
+        self.assertEqual(snapshot['sum'], 560.5)
+        self.assertEqual(snapshot['buckets'], [(1, 1), (10, 3), (100, 4), (float('inf'), 5)])
+        self.assertEqual(histogram.quantile(0.5), 10)
+        self.assertEqual(histogram.quantile(1.0), float('inf'))
+
+class TestTimerWheel(unittest.TestCase):
+
+    def test_far_future_timer_skips_empty_ticks(self):
+        wheel = TimerWheel(tick=0.01)
+        wheel.add(86400, "daily")
+        started = time.perf_counter()
+        self.assertEqual(wheel.advance(85852.16), [])
+        self.assertLess(time.perf_counter() - started, 0.1)
+        self.assertEqual(wheel.advance(86400), ["daily"])
+        self.assertEqual(len(wheel), 0)
+
+    def test_single_level_does_not_fire_far_timers_early(self):
+        wheel = TimerWheel(tick=1, slots=4, levels=1)
+        wheel.add(10, "far")
+        wheel.add(2, "near")
+        self.assertEqual(wheel.advance(3), ["near"])
+        self.assertEqual(wheel.advance(9), [])
+        self.assertEqual(len(wheel), 1)
+        self.assertEqual(wheel.advance(10), ["far"])
+
+    def test_remove_timer(self):
+        wheel = TimerWheel(tick=1)
+        handle = wheel.add(5, "a")
+        wheel.add(6, "b")
+        wheel.remove(handle)
+        self.assertEqual(wheel.advance(10), ["b"])
+
+class TestIndexedPriorityQueue(unittest.TestCase):
+
+    def test_remove_and_update_keep_heap_order(self):
+        queue = IndexedPriorityQueue()
+        tasks = [NetworkTask(priority, f"task{priority}", print) for priority in [5, 3, 8, 1, 9, 2, 7]]
+        for task in tasks:
+            queue.push(task)
+        queue.remove("task3")
+        queue.get("task9").priority = 0
+        queue.update("task9")
+        self.assertNotIn("task3", queue)
+        self.assertEqual([queue.pop().task_id for _ in range(len(queue))],
+                         ["task9", "task1", "task2", "task5", "task7", "task8"])
+
+    def test_push_duplicate_key(self):
+        queue = IndexedPriorityQueue()
+        queue.push(NetworkTask(0, "task", print))
+        with self.assertRaises(ValueError):
+            queue.push(NetworkTask(1, "task", print))
+
+class TestAsyncNetworkTaskScheduler(unittest.IsolatedAsyncioTestCase):
+
+    async def test_runs_tasks_in_priority_order(self):
+        order = []
+
+        async def record(name):
+            order.append(name)
+
+        scheduler = AsyncNetworkTaskScheduler(max_concurrency=1)
+        scheduler.add_task(2, "low", record, "low")
+        scheduler.add_task(0, "high", record, "high")
+        scheduler.add_task(1, "mid", record, "mid")
+        async with scheduler:
+            pass
+        self.assertEqual(order, ["high", "mid", "low"])
+
+    async def test_returns_results_and_limits_concurrency(self):
+        active = 0
+        peak = 0
+
+        async def probe(value):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return value * 2
+
+        async with AsyncNetworkTaskScheduler(max_concurrency=5) as scheduler:
+            futures = [scheduler.add_task(0, f"task{i}", probe, i) for i in range(50)]
+            results = await asyncio.gather(*futures)
+        self.assertEqual(results, [i * 2 for i in range(50)])
+        self.assertEqual(peak, 5)
+
+    async def test_exception_is_set_on_future(self):
+        async def fail():
+            raise ValueError("boom")
+
+        async with AsyncNetworkTaskScheduler() as scheduler:
+            future = scheduler.add_task(0, "fail", fail)
+            with self.assertRaises(ValueError):
+                await future
+
+if __name__ == '__main__':
+    unittest.main()